@@ -1,82 +1,197 @@
+import time
+BOOT_STARTED = time.perf_counter()  # до імпортів — щоб у звіті старту врахувати і їх
+
+import asyncio
+import io
+import logging
 import os
-import json
 from dotenv import load_dotenv
 
 from aiogram import Bot, Dispatcher, types
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
 from aiogram.utils import executor
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from aiogram.utils.exceptions import MessageNotModified
+
+from broadcast import WINDOW as BROADCAST_WINDOW, BroadcastStore, Broadcaster
+from bulk_content import MAX_IMPORT_BYTES, BulkError, export_csv, export_json, merge, parse_document
+from content_store import JsonContentStore, SQLiteContentStore
+from fsm_storage import SQLiteStorage
+from keyboards import (
+    InlineKeyboardRegistry, KeyboardRegistry, freeze, index_keyboard, make_inline_keyboard, make_keyboard,
+)
+from menu_model import Topic
+from menu_watcher import MenuWatcher
+from metrics import Metrics, MetricsMiddleware
+from nav_index import NodeIndex
+from persistence import file_signature
+from routing import Router, note_route
+from search_index import SearchIndex
+from sender import GLOBAL_RATE, SendScheduler
+from startup_timer import StartupTimer
+from topic_media import media_request, remember_file_ids
+from topic_render import RenderCache
+from webhook_server import MAX_IN_FLIGHT, WebhookServer, run_webhook
+from workers import run_worker
+
+boot = StartupTimer(BOOT_STARTED)
+boot.mark("import")
 
 # --- Load env and init ---
 load_dotenv()
 API_TOKEN = os.getenv("BOT_TOKEN")
+# BOT_MODE=webhook — апдейти приходять POST-запитами на aiohttp-сервер (див. webhook_server.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# BOT_ROLE=worker — процес-воркер за приймальником workers.py: апдейти зі stdin, свої чати за chat_id
+BOT_ROLE = os.getenv("BOT_ROLE", "single")
+WORKERS = int(os.getenv("WORKERS", "1")) if BOT_ROLE == "worker" else 1
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
 ADMIN_ID = 711960970  # ← заміни на свій Telegram ID
+# NAV_MODE=inline — навігація inline-кнопками з редагуванням одного повідомлення-меню
+NAV_MODE = os.getenv("NAV_MODE", "reply")
+
+# TELEGRAM_API_URL дозволяє направити бота на локальний (фейковий) Bot API сервер
+API_SERVER = (
+    TelegramAPIServer.from_base(os.getenv("TELEGRAM_API_URL"))
+    if os.getenv("TELEGRAM_API_URL") else TELEGRAM_PRODUCTION
+)
 
-bot = Bot(token=API_TOKEN, parse_mode="HTML")  # можна "HTML" або None
-storage = MemoryStorage()
+bot = Bot(token=API_TOKEN, parse_mode="HTML", server=API_SERVER)  # можна "HTML" або None
+# стани батьків і незавершені правки адміна переживають редеплой;
+# у пам'яті тримаємо не більше SESSION_MAX сесій, неактивні довше SESSION_TTL секунд видаляються
+storage = SQLiteStorage(
+    os.getenv("FSM_DB", "fsm.sqlite3"),
+    ttl=float(os.getenv("SESSION_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("SESSION_MAX", "10000")),
+)
 dp = Dispatcher(bot, storage=storage)
 
-MENU_FILE = "menu_data.json"
+# усі відповіді йдуть через черги чатів з лімітами Telegram, див. sender.py
+# ліміт Telegram на бота ділиться між воркерами; ліміт чату — ні, бо чат обслуговує один воркер
+sender = SendScheduler(bot, global_rate=GLOBAL_RATE / WORKERS)
 
-# === Helpers for long messages & schema migration ===
-
-MAX_TG = 4000  # запас до обмеження Telegram 4096 символів
-
-def split_text(text: str, max_len: int = MAX_TG):
-    """Розумний поділ довгого тексту на шматки ≤ max_len."""
-    seps = ["\n\n", "\n", ". "]
-    chunks, buf = [], text or ""
-    for sep in seps:
-        if len(buf) <= max_len:
-            break
-        while len(buf) > max_len:
-            cut = buf.rfind(sep, 0, max_len)
-            if cut == -1:
-                cut = max_len
-            chunks.append(buf[:cut].rstrip())
-            buf = buf[cut:].lstrip()
-    if buf:
-        chunks.append(buf)
-    return chunks
-
-def ensure_topic_structure(topic_obj: dict):
-    """
-    Міграція зі старого формату:
-      {'text': '...'} →
-      {'messages': ['...'], 'media': [], 'links': []}
-    і гарантія ключів у новому форматі.
-    """
-    if topic_obj is None:
-        return {"messages": [], "media": [], "links": []}
-    if "messages" not in topic_obj:
-        msgs = []
-        if topic_obj.get("text"):
-            msgs.append(topic_obj["text"])
-        topic_obj["messages"] = msgs
-    topic_obj.setdefault("media", [])
-    topic_obj.setdefault("links", [])
-    return topic_obj
-
-def migrate_menu_schema(data: dict):
-    """Пройтись по всіх темах і гарантувати наявність messages[]."""
-    for age_key, seasons in data.items():
-        for season_key, topics in seasons.items():
-            for topic_key, topic_obj in list(topics.items()):
-                topics[topic_key] = ensure_topic_structure(topic_obj)
-    return data
+async def reply(message: types.Message, text, **kwargs):
+    return await sender.send_message(message.chat.id, text, **kwargs)
+
+MENU_FILE = "menu_data.json"
+SEARCH_LIMIT = 10
+IMPORT_ATTEMPTS = 3  # скільки разів перераховувати імпорт, якщо меню змінили, поки він рахувався
+
+# === Metrics ===
+
+# METRICS_PORT — GET /metrics у форматі Prometheus; METRICS_LOG_INTERVAL — раз на N секунд рядок у лог (0 — вимкнено)
+metrics = Metrics()
+dp.middleware.setup(MetricsMiddleware(metrics, storage))
+metrics.instrument_bot(bot)
+metrics.instrument_sender(sender)
+metrics.instrument(
+    storage, ("get_state", "get_data", "set_state", "set_data", "update_data", "reset_state", "_flush"),
+    "bot_fsm_storage_seconds",
+)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+if METRICS_PORT:
+    METRICS_PORT += WORKER_INDEX  # у кожного воркера свій порт: METRICS_PORT, +1, +2…
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "60"))
+metrics_runner = metrics_log_task = None
+
+# === Content store ===
+
+# CONTENT_BACKEND=sqlite — контент у SQLite, правки пишуть лише зачеплені рядки (див. content_store.py);
+# за замовчуванням — menu_data.json цілком, з відкладеним записом
+if os.getenv("CONTENT_BACKEND", "json") == "sqlite":
+    content_store = SQLiteContentStore(os.getenv("CONTENT_DB", "content.sqlite3"))
+    if content_store.is_empty():
+        content_store.import_json(MENU_FILE)
+else:
+    content_store = JsonContentStore(MENU_FILE, delay=float(os.getenv("MENU_SAVE_DELAY", "1.0")))
+
+metrics.instrument(
+    content_store, ("save_all", "save_topic", "save_topic_ids", "delete_topic", "rename_topic", "set_message",
+                    "delete_message"),
+    "bot_content_store_seconds",
+)
+if isinstance(content_store, JsonContentStore):
+    content_store.persister.on_write = lambda seconds: metrics.observe("bot_menu_write_seconds", seconds)
 
 def load_menu():
-    with open(MENU_FILE, encoding="utf-8") as f:
-        raw = json.load(f)
-    return migrate_menu_schema(raw)
+    return content_store.load()
+
+def save_menu(menu):
+    content_store.save_all(menu)
+
+# міграція схеми — лише для даних старої версії, і результат одразу зберігається (див. SCHEMA_VERSION)
+raw_menu = content_store.parse()
+boot.mark("parse")
+menu = content_store.migrate(raw_menu)
+boot.mark("migrate")
 
-def save_menu(data):
-    with open(MENU_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# === Broadcasts ===
 
-menu_data = load_menu()
+# підписки батьків на вікові категорії й розсилки нових тем (див. broadcast.py);
+# розсилка йде через ту саму чергу sender, тож ліміти Telegram спільні з живими відповідями
+broadcasts = BroadcastStore(os.getenv("BROADCAST_DB", "broadcast.sqlite3"))
+broadcaster = Broadcaster(broadcasts, sender, window=int(os.getenv("BROADCAST_WINDOW", str(BROADCAST_WINDOW))))
+
+# === Derived caches ===
+
+# DELIVERY_MODE=packed — склеювати повідомлення теми в мінімум відправок (див. topic_render.py)
+DELIVERY_PACKED = os.getenv("DELIVERY_MODE") == "packed"
+
+def build_caches(data):
+    """
+    Усі похідні структури для меню data — нові об'єкти, поточні не змінюються.
+    Повертає (render_cache, nav_index, keyboards, inline_keyboards, search_index, ids_assigned).
+    """
+    render = RenderCache(packed=DELIVERY_PACKED)
+    render.build(data)
+    index = NodeIndex()
+    assigned = index.rebuild(data)
+    reply_kbs = KeyboardRegistry()
+    reply_kbs.rebuild(data)
+    inline_kbs = InlineKeyboardRegistry(index)
+    inline_kbs.rebuild(data)
+    search = SearchIndex()
+    search.build(data)
+    return render, index, reply_kbs, inline_kbs, search, assigned
+
+render_cache, nav_index, keyboards, inline_keyboards, search_index, ids_assigned = build_caches(menu)
+menu_generation = 0  # росте з кожною правкою меню й підміною: імпорт у потоці перевіряє, що його база не застаріла
+if ids_assigned:
+    content_store.save_topic_ids(ids_assigned)  # темам видано ID — фіксуємо їх одразу
+boot.mark("caches")
+
+def refresh_topic(age, season, topic, old_topic=None, structure=False):
+    """
+    Оновити кеші після зміни теми в адмінці.
+    old_topic — стара назва при перейменуванні; structure=True — тема додана/видалена.
+    """
+    global menu_generation
+    menu_generation += 1
+    if old_topic is not None:
+        render_cache.refresh(age, season, old_topic, None)
+        search_index.remove(age, season, old_topic)
+        nav_index.forget_topic(age, season, old_topic)
+        structure = True
+    topic_obj = menu.topic(age, season, topic)
+    render_cache.refresh(age, season, topic, topic_obj)
+    search_index.refresh(age, season, topic, topic_obj)
+    if topic_obj is None:
+        nav_index.forget_topic(age, season, topic)
+    elif nav_index.add_topic(age, season, topic, topic_obj):
+        content_store.save_topic(age, season, topic, topic_obj)
+    if structure:
+        keyboards.refresh_season(menu, age, season)
+        inline_keyboards.refresh_season(menu, age, season)
+
+def topic_by_id(topic_id):
+    """Стабільний ID теми → (age, season, topic, topic_obj) або None."""
+    node = nav_index.resolve_topic(topic_id)
+    if node is None:
+        return None
+    topic_obj = menu.topic(*node)
+    return (*node, topic_obj) if topic_obj is not None else None
 
 # === FSM ===
 
@@ -91,6 +206,7 @@ class AdminStates(StatesGroup):
     topic = State()
     action = State()
     content = State()
+    media = State()       # приймання фото/документів і посилань для теми
 
 class AdminMsgStates(StatesGroup):
     """Робота з повідомленнями в межах теми (add/edit/delete)."""
@@ -108,15 +224,16 @@ class AdminRenameStates(StatesGroup):
     topic = State()
     new_title = State()
 
-# === UI helpers ===
+class AdminBulkStates(StatesGroup):
+    """Масовий імпорт / експорт (див. bulk_content.py)."""
+    upload = State()      # очікування JSON/CSV-документа
+    age = State()         # експорт: вибір віку
+    season = State()      # експорт: сезон або весь вік
+
+# кнопки й вільний текст розводяться по хендлерах через словник, див. routing.py
+router = Router()
 
-def make_keyboard(options, add_back=True):
-    kb = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    for opt in options:
-        kb.add(KeyboardButton(opt))
-    if add_back:
-        kb.add(KeyboardButton("⬅️ Назад"))
-    return kb
+# === UI helpers ===
 
 admin_panel_kb = ReplyKeyboardMarkup(resize_keyboard=True)
 admin_panel_kb.add(
@@ -126,188 +243,383 @@ admin_panel_kb.add(
 admin_panel_kb.add(
     KeyboardButton("🧩 Повідомлення теми (додати/редагувати/видалити)"),
 )
+admin_panel_kb.add(
+    KeyboardButton("📎 Медіа й посилання теми"),
+)
+admin_panel_kb.add(
+    KeyboardButton("🔗 Посилання на тему"),
+    KeyboardButton("📢 Анонсувати тему"),
+)
+admin_panel_kb.add(
+    KeyboardButton("📥 Імпорт"),
+    KeyboardButton("📤 Експорт"),
+)
 admin_panel_kb.add(
     KeyboardButton("❌ Видалити тему"),
     KeyboardButton("⬅️ Назад")
 )
+admin_panel_kb = freeze(admin_panel_kb)
+
+mode_kb = ReplyKeyboardMarkup(resize_keyboard=True)
+mode_kb.add(KeyboardButton("➕ Додати повідомлення"))
+mode_kb.add(KeyboardButton("✏️ Редагувати повідомлення"))
+mode_kb.add(KeyboardButton("🗑 Видалити повідомлення"))
+mode_kb.add(KeyboardButton("⬅️ Назад"))
+mode_kb = freeze(mode_kb)
+
+media_kb = ReplyKeyboardMarkup(resize_keyboard=True)
+media_kb.add(KeyboardButton("🧹 Очистити медіа"), KeyboardButton("🧹 Очистити посилання"))
+media_kb.add(KeyboardButton("✅ Готово"))
+media_kb = freeze(media_kb)
 
-def make_mode_kb():
-    kb = ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add(KeyboardButton("➕ Додати повідомлення"))
-    kb.add(KeyboardButton("✏️ Редагувати повідомлення"))
-    kb.add(KeyboardButton("🗑 Видалити повідомлення"))
-    kb.add(KeyboardButton("⬅️ Назад"))
-    return kb
+remove_kb = freeze(ReplyKeyboardRemove())
+back_kb = freeze(make_keyboard(["⬅️ Назад"], add_back=False))
+topic_done_kb = freeze(make_keyboard(["📩 Текст для батьків", "⬅️ Назад"], add_back=False))
 
 # ========================= USER FLOW =========================
 
 @dp.message_handler(commands=['start'], state="*")
+@router.fallback(None)  # сесію видалено за TTL — будь-яка кнопка повертає на старт
 async def start_cmd(message: types.Message, state: FSMContext):
     await state.finish()
-    kb = make_keyboard(list(menu_data.keys()), add_back=False)
-    if message.from_user.id == ADMIN_ID:
-        kb.add(KeyboardButton("🛠 Адмін панель"))
-    await message.answer("Оберіть вікову категорію:", reply_markup=kb)
+    payload = message.get_args() if message.is_command() else None
+    if payload and await show_topic(message.chat.id, state, payload):
+        return
+    if NAV_MODE == "inline":
+        kb = inline_keyboards.start_admin if message.from_user.id == ADMIN_ID else inline_keyboards.start
+        return await reply(message, "Оберіть вікову категорію:", reply_markup=kb)
+    kb = keyboards.start_admin if message.from_user.id == ADMIN_ID else keyboards.start
+    await reply(message, "Оберіть вікову категорію:", reply_markup=kb)
     await MenuStates.age.set()
 
-@dp.message_handler(lambda m: m.text in menu_data, state=MenuStates.age)
+async def show_topic(chat_id, state: FSMContext, topic_id) -> bool:
+    """
+    Одразу видати тему за стабільним ID, без кроків меню:
+    /start <ID> (посилання з адмінки) і кнопки результатів /search.
+    """
+    found = topic_by_id(topic_id)
+    if found is None:
+        return False
+    age, season, topic, topic_obj = found
+    rendered = render_cache.get(age, season, topic, topic_obj)
+    if NAV_MODE == "inline":
+        done_kb = empty_kb = inline_keyboards.topic_done(age, season, topic_id)
+    else:
+        # стан як після ручного вибору теми, щоб «📩» і «⬅️ Назад» працювали далі
+        await state.set_data({"age": age, "season": season, "topic": topic})
+        await MenuStates.topic.set()
+        done_kb, empty_kb = topic_done_kb, back_kb
+    await deliver_topic(chat_id, (age, season, topic), rendered, done_kb, empty_kb)
+    return True
+
+async def deliver_topic(chat_id, node, rendered, done_kb, empty_kb):
+    """node — (age, season, topic): куди записати file_id файлів, завантажених уперше."""
+    if not rendered.chunks and not rendered.media:
+        return await sender.send_message(chat_id, "🔸 Наразі у темі немає повідомлень.", reply_markup=empty_kb)
+    # текст, альбоми й фінальне «Готово» стають у чергу чату одним пакетом
+    texts = [sender.submit(chat_id, "send_message", text=chunk) for chunk in rendered.chunks]
+    albums = []
+    for group in rendered.media:
+        method, kwargs = media_request(group)
+        albums.append((group, sender.submit(chat_id, method, **kwargs)))
+    done = sender.submit(chat_id, "send_message", text="Готово ✅", reply_markup=done_kb)
+    changed = False
+    for group, future in albums:
+        try:
+            changed |= remember_file_ids(group, await future)
+        except Exception:
+            logging.exception("Не вдалося надіслати медіа теми %s", node)
+    await asyncio.gather(*texts, done)
+    topic_obj = menu.topic(*node)
+    if changed and topic_obj is not None:
+        content_store.save_topic(*node, topic_obj)
+
+@dp.message_handler(commands=['search'], state="*")
+async def search_cmd(message: types.Message, state: FSMContext):
+    query = message.get_args()
+    if not query:
+        return await reply(message, "🔎 Напишіть, що шукати, наприклад: /search осінь листя")
+    hits = search_index.search(query, limit=SEARCH_LIMIT)
+    if not hits:
+        return await reply(message, "🔎 Нічого не знайдено. Спробуйте інші слова.")
+    # кнопки t:<ID> відкривають тему в будь-якому режимі навігації, див. nav_topic
+    kb = freeze(make_inline_keyboard([
+        (f"{hit.topic} · {hit.age}, {hit.season}", f"t:{menu.topic(hit.age, hit.season, hit.topic).id}")
+        for hit in hits
+    ]))
+    await reply(message, f"🔎 Знайдено тем: {len(hits)}", reply_markup=kb)
+
+@dp.message_handler(commands=['stats'], state="*")
+async def stats_cmd(message: types.Message, state: FSMContext):
+    if message.from_user.id != ADMIN_ID:
+        return await reply(message, "⛔ Ти не адмін.")
+    cache = render_cache.stats()
+    sessions = storage.stats()
+    await reply(
+        message,
+        "📊 Кеш тем: {entries} шт., влучань {hits}, промахів {misses}\n".format(**cache)
+        + "👥 Сесії: у пам'яті {cached}, у БД {stored}, "
+          "витіснено LRU {lru_evictions}, прострочено {expired}\n".format(**sessions)
+        + "📤 Відправка: у черзі {queued}, чатів {active_chats}, надіслано {sent}, "
+          "повторів {retries}, помилок {failed}\n".format(**sender.stats())
+        + "🔎 Пошук: тем {topics}, термів {terms}\n".format(**search_index.stats())
+        + "📢 Розсилки: активних {active}, оброблено {done} з {total}; ".format(**broadcaster.stats())
+        + "підписок {subscriptions} від {subscribers} чатів\n".format(**broadcasts.stats())
+        + f"🚀 Старт: {boot.report()}"
+    )
+
+@dp.message_handler(commands=['subscribe'], state="*")
+async def subscribe_cmd(message: types.Message, state: FSMContext):
+    ages = broadcasts.subscriptions(message.chat.id)
+    current = f"Ви вже підписані: {', '.join(ages)}.\n\n" if ages else ""
+    await reply(
+        message,
+        current + "🔔 Оберіть вікову категорію — нові теми для неї надходитимуть сюди:",
+        reply_markup=inline_keyboards.subscribe,
+    )
+
+@dp.message_handler(commands=['unsubscribe'], state="*")
+async def unsubscribe_cmd(message: types.Message, state: FSMContext):
+    broadcasts.unsubscribe(message.chat.id)
+    await reply(message, "🔕 Підписки скасовано. Повернутися можна командою /subscribe.")
+
 async def choose_season(message: types.Message, state: FSMContext):
     age = message.text.strip()
     await state.update_data(age=age)
-    seasons = menu_data[age].keys()
-    await message.answer("Оберіть сезон:", reply_markup=make_keyboard(seasons))
+    await reply(message, "Оберіть сезон:", reply_markup=keyboards.seasons(age))
     await MenuStates.season.set()
 
-@dp.message_handler(lambda m: m.text in ["⬅️ Назад"], state=MenuStates.season)
+router.set_choices(MenuStates.age, menu.ages.keys(), choose_season)
+
+@router.button("⬅️ Назад", state=MenuStates.season)
 async def back_to_age(message: types.Message, state: FSMContext):
     await start_cmd(message, state)
 
-@dp.message_handler(state=MenuStates.season)
+@router.fallback(MenuStates.season)
 async def choose_topic(message: types.Message, state: FSMContext):
     data = await state.get_data()
-    age = data["age"]
+    age = data.get("age")
+    if age not in menu.ages:
+        return await start_cmd(message, state)
     season = message.text.strip()
-    if season not in menu_data[age]:
-        await message.answer("Невірний сезон")
+    if menu.season(age, season) is None:
+        await reply(message, "Невірний сезон")
         return
     await state.update_data(season=season)
-    topics = list(menu_data[age][season].keys())
-    await message.answer("Оберіть тему:", reply_markup=make_keyboard(topics))
+    await reply(message, "Оберіть тему:", reply_markup=keyboards.topics(age, season))
     await MenuStates.topic.set()
 
-@dp.message_handler(lambda m: m.text == "⬅️ Назад", state=MenuStates.topic)
+@router.button("⬅️ Назад", state=MenuStates.topic)
 async def back_to_season(message: types.Message, state: FSMContext):
     data = await state.get_data()
-    age = data.get("age", "")
-    seasons = list(menu_data[age].keys())
-    await message.answer("Оберіть сезон:", reply_markup=make_keyboard(seasons))
+    age = data.get("age")
+    if age not in menu.ages:
+        return await start_cmd(message, state)
+    await reply(message, "Оберіть сезон:", reply_markup=keyboards.seasons(age))
     await MenuStates.season.set()
 
 
-@dp.message_handler(state=MenuStates.topic)
+@router.fallback(MenuStates.topic)
 async def handle_topic_selection(message: types.Message, state: FSMContext):
     text = message.text.strip()
+    data = await state.get_data()
+    age = data.get("age")
+    season = data.get("season")
+    if menu.season(age, season) is None:
+        # сесію втрачено — починаємо спочатку
+        return await start_cmd(message, state)
 
     # Якщо натиснуто "⬅️ Назад"
     if text == "⬅️ Назад":
-        data = await state.get_data()
-        age = data.get("age", "")
-        seasons = list(menu_data[age].keys())
-        await message.answer("Оберіть сезон:", reply_markup=make_keyboard(seasons))
+        await reply(message, "Оберіть сезон:", reply_markup=keyboards.seasons(age))
         return await MenuStates.season.set()
 
     # Якщо натиснуто "📩 Текст для батьків"
     if text == "📩 Текст для батьків":
-        data = await state.get_data()
-        age = data.get("age")
-        season = data.get("season")
         topic = data.get("topic")
 
-        topic_obj = menu_data.get(age, {}).get(season, {}).get(topic)
-        topic_obj = ensure_topic_structure(topic_obj)
-        messages_list = topic_obj.get("messages", [])
+        topic_obj = menu.topic(age, season, topic)
+        rendered = render_cache.get(age, season, topic, topic_obj)
 
-        if not messages_list:
-            return await message.answer("⚠️ Немає повідомлень у темі.")
+        if not rendered.first_chunks:
+            return await reply(message, "⚠️ Немає повідомлень у темі.")
 
-        first_msg = messages_list[0]
-        for chunk in split_text(first_msg):
-            await message.answer(chunk)
+        await sender.send_messages(message.chat.id, rendered.first_chunks)
         return
 
     # Інакше — звичайний вибір теми
-    data = await state.get_data()
-    age = data.get("age")
-    season = data.get("season")
     topic = text
 
-    topic_obj = menu_data.get(age, {}).get(season, {}).get(topic)
-    if not topic_obj:
-        await message.answer("⛔ Тема не знайдена.")
+    topic_obj = menu.topic(age, season, topic)
+    if topic_obj is None:
+        await reply(message, "⛔ Тема не знайдена.")
         return
 
     await state.update_data(topic=topic)
 
-    topic_obj = ensure_topic_structure(topic_obj)
-    messages_list = topic_obj.get("messages", [])
-    if not messages_list:
-        await message.answer(
-            "🔸 Наразі у темі немає повідомлень.",
-            reply_markup=make_keyboard(["⬅️ Назад"], add_back=False)
-        )
-        return
+    rendered = render_cache.get(age, season, topic, topic_obj)
+    await deliver_topic(message.chat.id, (age, season, topic), rendered, topic_done_kb, back_kb)
 
-    for msg_text in messages_list:
-        for chunk in split_text(msg_text):
-            await message.answer(chunk)
 
-    await message.answer(
-        "Готово ✅",
-        reply_markup=make_keyboard(["📩 Текст для батьків", "⬅️ Назад"], add_back=False)
-    )
+# ----- Inline-навігація (NAV_MODE=inline): одне меню, що редагується на місці -----
 
+async def edit_menu(query: types.CallbackQuery, text, reply_markup):
+    try:
+        await sender.submit(
+            query.message.chat.id, "edit_message_text",
+            message_id=query.message.message_id, text=text, reply_markup=reply_markup,
+        )
+    except MessageNotModified:
+        pass
+
+async def nav_home(query: types.CallbackQuery, arg, state: FSMContext):
+    kb = inline_keyboards.start_admin if query.from_user.id == ADMIN_ID else inline_keyboards.start
+    await edit_menu(query, "Оберіть вікову категорію:", kb)
+
+async def nav_age(query: types.CallbackQuery, arg, state: FSMContext):
+    age = nav_index.resolve_age(arg)
+    if age not in menu.ages:
+        return await nav_stale(query, arg, state)
+    await edit_menu(query, "Оберіть сезон:", inline_keyboards.seasons(age))
+
+async def nav_season(query: types.CallbackQuery, arg, state: FSMContext):
+    node = nav_index.resolve_season(*arg.split(":", 1)) if ":" in arg else None
+    if node is None or menu.season(*node) is None:
+        return await nav_stale(query, arg, state)
+    await edit_menu(query, "Оберіть тему:", inline_keyboards.topics(*node))
+
+async def nav_topic(query: types.CallbackQuery, arg, state: FSMContext):
+    if NAV_MODE != "inline":
+        # результат /search у режимі reply-клавіатур — як перехід за посиланням на тему
+        if not await show_topic(query.message.chat.id, state, arg):
+            await sender.send_message(query.message.chat.id, "❌ Тема не знайдена.")
+        return
+    found = topic_by_id(arg)
+    if found is None:
+        return await nav_stale(query, arg, state)
+    age, season, topic, topic_obj = found
+    rendered = render_cache.get(age, season, topic, topic_obj)
+    done_kb = inline_keyboards.topic_done(age, season, arg)
+    if not rendered.chunks and not rendered.media:
+        return await edit_menu(query, "🔸 Наразі у темі немає повідомлень.", done_kb)
+    # вміст іде новими повідомленнями, а «Готово» з кнопками стає новим меню внизу чату
+    await deliver_topic(query.message.chat.id, (age, season, topic), rendered, done_kb, done_kb)
+
+async def nav_parents_text(query: types.CallbackQuery, arg, state: FSMContext):
+    found = topic_by_id(arg)
+    if found is None:
+        return await nav_stale(query, arg, state)
+    rendered = render_cache.get(*found)
+    if not rendered.first_chunks:
+        return await sender.send_message(query.message.chat.id, "⚠️ Немає повідомлень у темі.")
+    await sender.send_messages(query.message.chat.id, rendered.first_chunks)
+
+async def nav_admin(query: types.CallbackQuery, arg, state: FSMContext):
+    if query.from_user.id != ADMIN_ID:
+        return
+    await state.finish()
+    await sender.send_message(query.message.chat.id, "Панель адміністратора:", reply_markup=admin_panel_kb)
+
+async def nav_subscribe(query: types.CallbackQuery, arg, state: FSMContext):
+    age = nav_index.resolve_age(arg)
+    if age not in menu.ages:
+        return await sender.send_message(query.message.chat.id, "❌ Категорія не знайдена. Спробуйте /subscribe ще раз.")
+    broadcasts.subscribe(query.message.chat.id, age)
+    await sender.send_message(query.message.chat.id, f"🔔 Підписано на «{age}». Відписатися: /unsubscribe")
+
+async def nav_unsubscribe(query: types.CallbackQuery, arg, state: FSMContext):
+    broadcasts.unsubscribe(query.message.chat.id)
+    await sender.send_message(query.message.chat.id, "🔕 Підписки скасовано.")
+
+async def nav_stale(query: types.CallbackQuery, arg, state: FSMContext):
+    """Кнопка зі старого меню (тему видалено чи змінено структуру) — повертаємо на початок."""
+    await nav_home(query, arg, state)
+
+NAV_CALLBACKS = {
+    "home": nav_home,
+    "a": nav_age,
+    "s": nav_season,
+    "t": nav_topic,
+    "p": nav_parents_text,
+    "admin": nav_admin,
+    "sub": nav_subscribe,
+    "unsub": nav_unsubscribe,
+}
+
+@dp.callback_query_handler(state="*")
+async def nav_callback(query: types.CallbackQuery, state: FSMContext):
+    kind, _, arg = (query.data or "").partition(":")
+    await query.answer()
+    handler = NAV_CALLBACKS.get(kind, nav_stale)
+    note_route(handler)
+    await handler(query, arg, state)
 
 
 # ========================= ADMIN FLOW =========================
 
-@dp.message_handler(lambda m: m.text == "🛠 Адмін панель", state="*")
+@router.button("🛠 Адмін панель")
 async def admin_panel(message: types.Message, state: FSMContext):
     if message.from_user.id != ADMIN_ID:
-        await message.answer("⛔ Ти не адмін.")
+        await reply(message, "⛔ Ти не адмін.")
         return
     await state.finish()
-    await message.answer("Панель адміністратора:", reply_markup=admin_panel_kb)
+    await reply(message, "Панель адміністратора:", reply_markup=admin_panel_kb)
 
 # ----- Старе меню керування темами (add/edit/delete) -----
 
-@dp.message_handler(lambda m: m.text in ["➕ Додати тему", "❌ Видалити тему"], state="*")
+@router.button("➕ Додати тему", "❌ Видалити тему", "🔗 Посилання на тему", "📎 Медіа й посилання теми",
+               "📢 Анонсувати тему")
 async def choose_admin_action_simple(message: types.Message, state: FSMContext):
     if message.from_user.id != ADMIN_ID:
-        return await message.answer("⛔ Ти не адмін.")
+        return await reply(message, "⛔ Ти не адмін.")
     action_map = {
         "➕ Додати тему": "add",
-        "❌ Видалити тему": "delete"
+        "❌ Видалити тему": "delete",
+        "🔗 Посилання на тему": "link",
+        "📎 Медіа й посилання теми": "media",
+        "📢 Анонсувати тему": "announce",
     }
     await state.set_state(AdminStates.age)
-    await state.update_data(action=action_map[message.text])
-    await message.answer("Оберіть вікову категорію:", reply_markup=make_keyboard(list(menu_data.keys())))
+    action = action_map.get(message.text.strip())
+    if action:  # «⬅️ Назад» із вибору сезону зберігає вже обрану дію
+        await state.update_data(action=action)
+    await reply(message, "Оберіть вікову категорію:", reply_markup=keyboards.ages)
 
-@dp.message_handler(lambda m: m.text == "✏️ Перейменувати тему", state="*")
+@router.button("✏️ Перейменувати тему")
 async def rename_topic_entry(message: types.Message, state: FSMContext):
     if message.from_user.id != ADMIN_ID:
-        return await message.answer("⛔ Ти не адмін.")
+        return await reply(message, "⛔ Ти не адмін.")
     await state.finish()
     await AdminRenameStates.age.set()
-    await message.answer("Оберіть вікову категорію:", reply_markup=make_keyboard(list(menu_data.keys())))
+    await reply(message, "Оберіть вікову категорію:", reply_markup=keyboards.ages)
 
-@dp.message_handler(state=AdminStates.age)
+@router.fallback(AdminStates.age)
 async def admin_choose_season(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await admin_panel(message, state)
     age = message.text.strip()
-    if age not in menu_data:
-        await message.answer("Невірна категорія")
+    if age not in menu.ages:
+        await reply(message, "Невірна категорія")
         return
     await state.update_data(age=age)
     await AdminStates.season.set()
-    await message.answer("Оберіть сезон:", reply_markup=make_keyboard(menu_data[age].keys()))
+    await reply(message, "Оберіть сезон:", reply_markup=keyboards.seasons(age))
 
-@dp.message_handler(state=AdminStates.season)
+@router.fallback(AdminStates.season)
 async def admin_choose_topic(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await choose_admin_action_simple(message, state)
     data = await state.get_data()
     age = data['age']
     season = message.text.strip()
-    if season not in menu_data[age]:
-        await message.answer("Невірний сезон")
+    if menu.season(age, season) is None:
+        await reply(message, "Невірний сезон")
         return
     await state.update_data(season=season)
     await AdminStates.topic.set()
-    topics = list(menu_data[age][season].keys())
-    await message.answer("Оберіть тему:", reply_markup=make_keyboard(topics))
+    await reply(message, "Оберіть тему:", reply_markup=keyboards.topics(age, season))
 
-@dp.message_handler(state=AdminStates.topic)
+@router.fallback(AdminStates.topic)
 async def admin_topic_action(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await admin_choose_season(message, state)
@@ -318,196 +630,405 @@ async def admin_topic_action(message: types.Message, state: FSMContext):
     await state.update_data(topic=topic)
 
     if action == "delete":
-        if topic in menu_data[age][season]:
-            del menu_data[age][season][topic]
-            save_menu(menu_data)
-            await message.answer("✅ Тему видалено.", reply_markup=admin_panel_kb)
+        if menu.remove_topic(age, season, topic) is not None:
+            content_store.delete_topic(age, season, topic)
+            refresh_topic(age, season, topic, structure=True)
+            await reply(message, "✅ Тему видалено.", reply_markup=admin_panel_kb)
         else:
-            await message.answer("❌ Тема не знайдена.", reply_markup=admin_panel_kb)
+            await reply(message, "❌ Тема не знайдена.", reply_markup=admin_panel_kb)
+        await state.finish()
+        return
+
+    if action == "link":
+        topic_obj = menu.topic(age, season, topic)
+        if topic_obj is None:
+            return await reply(message, "❌ Тема не знайдена.")
+        me = await bot.me
+        await reply(
+            message,
+            f"🔗 Посилання на «{topic}» (працює і після перейменування):\n"
+            f"https://t.me/{me.username}?start={topic_obj.id}",
+            reply_markup=admin_panel_kb,
+        )
         await state.finish()
         return
 
+    if action == "announce":
+        await reply(message, announce_topic(age, season, topic), reply_markup=admin_panel_kb)
+        await state.finish()
+        return
+
+    if action == "media":
+        topic_obj = menu.topic(age, season, topic)
+        if topic_obj is None:
+            return await reply(message, "❌ Тема не знайдена.")
+        await AdminStates.media.set()
+        await reply(
+            message,
+            f"📎 Тема «{topic}»: медіа {len(topic_obj.media)}, посилань {len(topic_obj.links)}.\n\n"
+            "Надсилай фото чи документи (підпис стане підписом у темі) "
+            "або посилання у форматі «Назва | https://...». Коли все — «✅ Готово».",
+            reply_markup=media_kb,
+        )
+        return
+
     # action == "add": додавання/оновлення «першого повідомлення» теми
     await AdminStates.content.set()
-    await message.answer("Введіть текст теми (буде збережено як перше повідомлення):", reply_markup=ReplyKeyboardRemove())
+    await reply(message, "Введіть текст теми (буде збережено як перше повідомлення):", reply_markup=remove_kb)
 
-@dp.message_handler(state=AdminStates.content)
+@router.fallback(AdminStates.content)
 async def admin_save_content(message: types.Message, state: FSMContext):
     """Збереження 'першого' повідомлення теми для простого сценарію."""
     data = await state.get_data()
     age, season, topic = data["age"], data["season"], data["topic"]
     content = (message.text or "").strip()
     if not content:
-        await message.answer("⚠️ Текст не може бути порожнім.")
+        await reply(message, "⚠️ Текст не може бути порожнім.")
         return
 
-    topic_obj = menu_data[age][season].get(topic)
-    if not topic_obj:
+    topic_obj = menu.topic(age, season, topic)
+    created = topic_obj is None
+    if created:
         # створюємо нову тему
-        menu_data[age][season][topic] = {"messages": [content], "media": [], "links": []}
+        topic_obj = menu.add_topic(age, season, topic, Topic(messages=(content,)))
+        # ID — ще до першого запису: інакше інший воркер, перечитавши тему без ID, видасть його сам
+        nav_index.add_topic(age, season, topic, topic_obj)
+        content_store.save_topic(age, season, topic, topic_obj)
     else:
-        topic_obj = ensure_topic_structure(topic_obj)
-        if topic_obj["messages"]:
-            topic_obj["messages"][0] = content
-        else:
-            topic_obj["messages"].append(content)
-        menu_data[age][season][topic] = topic_obj
+        topic_obj.messages = (content, *topic_obj.messages[1:])
+        content_store.set_message(age, season, topic, 0, content)
+
+    refresh_topic(age, season, topic, structure=created)
+    await reply(message, "✅ Тему збережено.", reply_markup=admin_panel_kb)
+    await state.finish()
+
+# ----- Розсилка теми підписникам -----
 
-    save_menu(menu_data)
-    await message.answer("✅ Тему збережено.", reply_markup=admin_panel_kb)
+def announcement(topic_id):
+    """
+    Тексти розсилки теми за стабільним ID (тема могла бути перейменована після запуску):
+    заголовок і вже розбиті шматки; () — якщо теми чи тексту немає.
+    """
+    found = topic_by_id(topic_id) if topic_id else None
+    if found is None:
+        return ()
+    age, season, topic, _ = found
+    rendered = render_cache.get(*found)
+    if not rendered.chunks:
+        return ()
+    return (f"🆕 Нова тема для «{age}», {season}: «{topic}»", *rendered.chunks)
+
+def announce_topic(age, season, topic) -> str:
+    """Запустити розсилку теми; повертає відповідь адміну."""
+    topic_obj = menu.topic(age, season, topic)
+    if topic_obj is None:
+        return "❌ Тема не знайдена."
+    chunks = announcement(topic_obj.id)
+    if not chunks:
+        return "⚠️ Немає повідомлень у темі."
+    if broadcasts.active(topic_obj.id) is not None:
+        return "⏳ Цю тему вже розсилають — звіт прийде після завершення."
+    if not broadcasts.subscribers(age):
+        return f"🔕 На «{age}» ще ніхто не підписався."
+    broadcast = broadcasts.create(topic_obj.id, age, season, topic, owner=WORKER_INDEX)
+    broadcaster.start(broadcast, chunks, on_done=report_broadcast)
+    total = broadcasts.counts(broadcast)["total"]
+    return f"📢 Розсилку #{broadcast} запущено: отримувачів {total}. Звіт прийде після завершення."
+
+async def report_broadcast(report):
+    if report["aborted"]:
+        text = ("⚠️ Розсилку #{id} скасовано: тему видалено або в ній немає тексту. "
+                "Доставлено {sent} з {total}, решті не надіслано.".format(**report))
+    else:
+        resumed = f" (продовжено після рестарту: вже було {report['resumed']})" if report["resumed"] else ""
+        text = ("📢 Розсилка #{id} завершена за {seconds:.1f} с: доставлено {sent} з {total}, "
+                "не доставлено {failed}. Швидкість {messages_per_sec:.1f} повідомлень/с".format(**report) + resumed)
+    try:
+        await sender.send_message(ADMIN_ID, text)
+    except Exception:
+        logging.exception("Не вдалося надіслати звіт розсилки %s", report["id"])
+
+# ----- Масовий імпорт / експорт -----
+
+@router.button("📥 Імпорт")
+async def bulk_import_entry(message: types.Message, state: FSMContext):
+    if message.from_user.id != ADMIN_ID:
+        return await reply(message, "⛔ Ти не адмін.")
     await state.finish()
+    await AdminBulkStates.upload.set()
+    await reply(
+        message,
+        "📥 Надішли файл .json (як з «📤 Експорт») або .csv з колонками age,season,topic,message — "
+        "рядок на повідомлення.\n\nТеми з файлу додаються або переписуються цілком, "
+        "решта лишається як є. У CSV медіа й посилання тем не змінюються.",
+        reply_markup=back_kb,
+    )
+
+@dp.message_handler(content_types=[types.ContentType.DOCUMENT], state=AdminBulkStates.upload)
+async def bulk_import_upload(message: types.Message, state: FSMContext):
+    document = message.document
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        return await reply(message, f"⚠️ Файл завеликий: до {MAX_IMPORT_BYTES // 2 ** 20} МБ.")
+    stream = await bot.download_file_by_id(document.file_id)  # BytesIO, вже на початку
+    try:
+        doc = await asyncio.get_running_loop().run_in_executor(None, parse_document, document.file_name, stream)
+    except BulkError as e:
+        return await reply(message, f"⚠️ Файл не імпортовано, меню не змінено.\n{e}")
+    report = await apply_import(doc)
+    if report is None:
+        return await reply(message, "⚠️ Меню саме редагують — імпорт не застосовано. Надішли файл ще раз.")
+    await state.finish()
+    await reply(
+        message,
+        "✅ Імпортовано: нових тем {added}, оновлено {updated}, повідомлень у них {messages}.".format(**report),
+        reply_markup=admin_panel_kb,
+    )
+
+@router.fallback(AdminBulkStates.upload)
+async def bulk_import_text(message: types.Message, state: FSMContext):
+    if message.text == "⬅️ Назад":
+        return await admin_panel(message, state)
+    await reply(message, "⚠️ Очікую файл .json або .csv.")
+
+@router.button("📤 Експорт")
+async def bulk_export_entry(message: types.Message, state: FSMContext):
+    if message.from_user.id != ADMIN_ID:
+        return await reply(message, "⛔ Ти не адмін.")
+    await state.finish()
+    await AdminBulkStates.age.set()
+    await reply(message, "Оберіть вікову категорію:", reply_markup=keyboards.ages)
+
+@router.fallback(AdminBulkStates.age)
+async def bulk_export_age(message: types.Message, state: FSMContext):
+    if message.text == "⬅️ Назад":
+        return await admin_panel(message, state)
+    age = message.text.strip()
+    if age not in menu.ages:
+        return await reply(message, "Невірна категорія")
+    await state.update_data(age=age)
+    await AdminBulkStates.season.set()
+    kb = freeze(make_keyboard([*menu.ages[age].seasons, "📚 Увесь вік"]))
+    await reply(message, "Оберіть сезон або весь вік:", reply_markup=kb)
+
+@router.fallback(AdminBulkStates.season)
+async def bulk_export_season(message: types.Message, state: FSMContext):
+    if message.text == "⬅️ Назад":
+        return await bulk_export_entry(message, state)
+    age = (await state.get_data()).get("age")
+    season = None if message.text == "📚 Увесь вік" else message.text.strip()
+    if age not in menu.ages or (season is not None and menu.season(age, season) is None):
+        return await reply(message, "Невірний сезон")
+    await state.finish()
+    name = f"{age} {season}" if season else age
+    # JSON — повна копія (з медіа й посиланнями), CSV — для правок у таблиці
+    for data, extension in ((export_json(menu, age, season), "json"), (export_csv(menu, age, season), "csv")):
+        await sender.submit(message.chat.id, "send_document",
+                            document=types.InputFile(io.BytesIO(data), filename=f"{name}.{extension}"))
+    await reply(message, "📤 Експорт готовий. Відредагуй файл і надішли через «📥 Імпорт».",
+                reply_markup=admin_panel_kb)
+
+# ----- Медіа й посилання теми -----
+
+async def media_topic(state: FSMContext):
+    """Тема, до якої адмін зараз додає медіа: (age, season, topic, topic_obj або None)."""
+    data = await state.get_data()
+    age, season, topic = data["age"], data["season"], data["topic"]
+    return age, season, topic, menu.topic(age, season, topic)
+
+@dp.message_handler(content_types=[types.ContentType.PHOTO, types.ContentType.DOCUMENT], state=AdminStates.media)
+async def admin_media_upload(message: types.Message, state: FSMContext):
+    age, season, topic, topic_obj = await media_topic(state)
+    if topic_obj is None:
+        await state.finish()
+        return await reply(message, "❌ Тема не знайдена.", reply_markup=admin_panel_kb)
+    # file_id уже на серверах Telegram — у темі зберігається лише він, байти більше не ганяємо
+    if message.photo:
+        item = {"type": "photo", "file_id": message.photo[-1].file_id}
+    else:
+        item = {"type": "document", "file_id": message.document.file_id}
+    if message.caption:
+        item["caption"] = message.html_text
+    topic_obj.media = (*topic_obj.media, item)
+    content_store.save_topic(age, season, topic, topic_obj)
+    refresh_topic(age, season, topic)
+    await reply(message, f"✅ Додано. Медіа в темі: {len(topic_obj.media)}")
+
+@router.button("🧹 Очистити медіа", "🧹 Очистити посилання", state=AdminStates.media)
+async def admin_media_clear(message: types.Message, state: FSMContext):
+    age, season, topic, topic_obj = await media_topic(state)
+    if topic_obj is None:
+        await state.finish()
+        return await reply(message, "❌ Тема не знайдена.", reply_markup=admin_panel_kb)
+    if message.text.strip() == "🧹 Очистити медіа":
+        topic_obj.media = ()
+    else:
+        topic_obj.links = ()
+    content_store.save_topic(age, season, topic, topic_obj)
+    refresh_topic(age, season, topic)
+    await reply(message, "✅ Очищено.", reply_markup=media_kb)
+
+@router.button("✅ Готово", state=AdminStates.media)
+async def admin_media_done(message: types.Message, state: FSMContext):
+    await admin_panel(message, state)
+
+@router.fallback(AdminStates.media)
+async def admin_media_link(message: types.Message, state: FSMContext):
+    age, season, topic, topic_obj = await media_topic(state)
+    if topic_obj is None:
+        await state.finish()
+        return await reply(message, "❌ Тема не знайдена.", reply_markup=admin_panel_kb)
+    title, _, url = (message.text or "").rpartition("|")
+    title, url = title.strip(), url.strip()
+    if not url.startswith(("http://", "https://", "tg://")):
+        return await reply(message, "⚠️ Надішли фото/документ або посилання «Назва | https://...».")
+    topic_obj.links = (*topic_obj.links, {"title": title or url, "url": url})
+    content_store.save_topic(age, season, topic, topic_obj)
+    refresh_topic(age, season, topic)
+    await reply(message, f"✅ Посилання додано. Посилань у темі: {len(topic_obj.links)}")
 
 # ----- Перейменування теми -----
 
-@dp.message_handler(state=AdminRenameStates.age)
+@router.fallback(AdminRenameStates.age)
 async def rename_topic_age(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await admin_panel(message, state)
     age = message.text.strip()
-    if age not in menu_data:
-        return await message.answer("Невірна категорія")
+    if age not in menu.ages:
+        return await reply(message, "Невірна категорія")
     await state.update_data(age=age)
     await AdminRenameStates.season.set()
-    await message.answer("Оберіть сезон:", reply_markup=make_keyboard(menu_data[age].keys()))
+    await reply(message, "Оберіть сезон:", reply_markup=keyboards.seasons(age))
 
-@dp.message_handler(state=AdminRenameStates.season)
+@router.fallback(AdminRenameStates.season)
 async def rename_topic_season(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await rename_topic_entry(message, state)
     data = await state.get_data()
     age = data["age"]
     season = message.text.strip()
-    if season not in menu_data[age]:
-        return await message.answer("Невірний сезон")
+    if menu.season(age, season) is None:
+        return await reply(message, "Невірний сезон")
     await state.update_data(season=season)
-    topics = list(menu_data[age][season].keys())
     await AdminRenameStates.topic.set()
-    await message.answer("Оберіть тему для перейменування:", reply_markup=make_keyboard(topics))
+    await reply(message, "Оберіть тему для перейменування:", reply_markup=keyboards.topics(age, season))
 
-@dp.message_handler(state=AdminRenameStates.topic)
+@router.fallback(AdminRenameStates.topic)
 async def rename_topic_pick(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await rename_topic_season(message, state)
     data = await state.get_data()
     age, season = data["age"], data["season"]
     old_topic = message.text.strip()
-    if old_topic not in menu_data[age][season]:
-        return await message.answer("❌ Тема не знайдена.")
+    if menu.topic(age, season, old_topic) is None:
+        return await reply(message, "❌ Тема не знайдена.")
     await state.update_data(old_topic=old_topic)
     await AdminRenameStates.new_title.set()
-    await message.answer(f"Поточна назва: «{old_topic}»\n\nВведи НОВУ назву теми:", reply_markup=ReplyKeyboardRemove())
+    await reply(message, f"Поточна назва: «{old_topic}»\n\nВведи НОВУ назву теми:", reply_markup=remove_kb)
 
-@dp.message_handler(state=AdminRenameStates.new_title)
+@router.fallback(AdminRenameStates.new_title)
 async def rename_topic_apply(message: types.Message, state: FSMContext):
     data = await state.get_data()
     age, season, old_topic = data["age"], data["season"], data["old_topic"]
     new_title = (message.text or "").strip()
     if not new_title:
-        return await message.answer("Назва не може бути порожньою. Введи іншу:")
-    # перейменувати ключ теми в JSON
-    topic_obj = menu_data[age][season].pop(old_topic)
-    menu_data[age][season][new_title] = topic_obj
-    save_menu(menu_data)
+        return await reply(message, "Назва не може бути порожньою. Введи іншу:")
+    # тема лишається на своєму місці в сезоні
+    menu.rename_topic(age, season, old_topic, new_title)
+    content_store.rename_topic(age, season, old_topic, new_title)
+    refresh_topic(age, season, new_title, old_topic=old_topic)
     await state.finish()
-    await message.answer(f"✅ Назву змінено на: «{new_title}»", reply_markup=admin_panel_kb)
+    await reply(message, f"✅ Назву змінено на: «{new_title}»", reply_markup=admin_panel_kb)
 
 # ----- НОВЕ: робота з повідомленнями теми (add/edit/delete) -----
 
-@dp.message_handler(lambda m: m.text == "🧩 Повідомлення теми (додати/редагувати/видалити)", state="*")
+@router.button("🧩 Повідомлення теми (додати/редагувати/видалити)")
 async def admin_msgs_entry(message: types.Message, state: FSMContext):
     if message.from_user.id != ADMIN_ID:
-        return await message.answer("⛔ Ти не адмін.")
+        return await reply(message, "⛔ Ти не адмін.")
     await state.finish()
     await AdminMsgStates.age.set()
-    await message.answer("Оберіть вікову категорію:", reply_markup=make_keyboard(list(menu_data.keys())))
+    await reply(message, "Оберіть вікову категорію:", reply_markup=keyboards.ages)
 
-@dp.message_handler(state=AdminMsgStates.age)
+@router.fallback(AdminMsgStates.age)
 async def admin_msgs_choose_season(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await admin_panel(message, state)
     age = message.text.strip()
-    if age not in menu_data:
-        return await message.answer("Невірна категорія")
+    if age not in menu.ages:
+        return await reply(message, "Невірна категорія")
     await state.update_data(age=age)
     await AdminMsgStates.season.set()
-    await message.answer("Оберіть сезон:", reply_markup=make_keyboard(menu_data[age].keys()))
+    await reply(message, "Оберіть сезон:", reply_markup=keyboards.seasons(age))
 
-@dp.message_handler(state=AdminMsgStates.season)
+@router.fallback(AdminMsgStates.season)
 async def admin_msgs_choose_topic(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await admin_msgs_entry(message, state)
     data = await state.get_data()
     age = data['age']
     season = message.text.strip()
-    if season not in menu_data[age]:
-        return await message.answer("Невірний сезон")
+    if menu.season(age, season) is None:
+        return await reply(message, "Невірний сезон")
     await state.update_data(season=season)
-    topics = list(menu_data[age][season].keys())
     await AdminMsgStates.topic.set()
-    await message.answer("Оберіть тему:", reply_markup=make_keyboard(topics))
+    await reply(message, "Оберіть тему:", reply_markup=keyboards.topics(age, season))
 
-@dp.message_handler(state=AdminMsgStates.topic)
+@router.fallback(AdminMsgStates.topic)
 async def admin_msgs_mode(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         return await admin_msgs_choose_topic(message, state)
     data = await state.get_data()
     age, season = data["age"], data["season"]
     topic = message.text.strip()
-    if topic not in menu_data[age][season]:
-        return await message.answer("❌ Тема не знайдена.")
+    if menu.topic(age, season, topic) is None:
+        return await reply(message, "❌ Тема не знайдена.")
     await state.update_data(topic=topic)
     await AdminMsgStates.mode.set()
-    await message.answer("Виберіть дію:", reply_markup=make_mode_kb())
+    await reply(message, "Виберіть дію:", reply_markup=mode_kb)
 
-@dp.message_handler(state=AdminMsgStates.mode)
+@router.fallback(AdminMsgStates.mode)
 async def admin_msgs_route(message: types.Message, state: FSMContext):
     action = message.text.strip()
     data = await state.get_data()
     age, season, topic = data["age"], data["season"], data["topic"]
-    topic_obj = ensure_topic_structure(menu_data[age][season][topic])
-    msgs = topic_obj["messages"]
+    msgs = menu.topic(age, season, topic).messages
 
     if action == "➕ Додати повідомлення":
         await AdminMsgStates.content.set()
-        return await message.answer("Надішли текст НОВОГО повідомлення (може бути довгим):", reply_markup=ReplyKeyboardRemove())
+        return await reply(message, "Надішли текст НОВОГО повідомлення (може бути довгим):", reply_markup=remove_kb)
 
     if action in ("✏️ Редагувати повідомлення", "🗑 Видалити повідомлення"):
         if not msgs:
             await AdminMsgStates.mode.set()
-            return await message.answer("У темі ще немає повідомлень.", reply_markup=make_mode_kb())
+            return await reply(message, "У темі ще немає повідомлень.", reply_markup=mode_kb)
         # список для вибору індексу
-        kb = ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-        for i in range(1, len(msgs)+1):
-            kb.add(KeyboardButton(str(i)))
-        kb.add(KeyboardButton("⬅️ Назад"))
         await state.update_data(op="edit" if "Редагувати" in action else "delete")
         await AdminMsgStates.list_wait.set()
-        return await message.answer("Оберіть номер повідомлення:", reply_markup=kb)
+        return await reply(message, "Оберіть номер повідомлення:", reply_markup=index_keyboard(len(msgs)))
 
     if action == "⬅️ Назад":
-        topics = list(menu_data[age][season].keys())
         await AdminMsgStates.topic.set()
-        return await message.answer("Оберіть тему:", reply_markup=make_keyboard(topics))
+        return await reply(message, "Оберіть тему:", reply_markup=keyboards.topics(age, season))
 
-    await message.answer("Команда не розпізнана. Оберіть дію з клавіатури.")
+    await reply(message, "Команда не розпізнана. Оберіть дію з клавіатури.")
 
-@dp.message_handler(state=AdminMsgStates.list_wait)
+@router.fallback(AdminMsgStates.list_wait)
 async def admin_msgs_pick_index(message: types.Message, state: FSMContext):
     if message.text == "⬅️ Назад":
         await AdminMsgStates.mode.set()
-        return await message.answer("Виберіть дію:", reply_markup=make_mode_kb())
+        return await reply(message, "Виберіть дію:", reply_markup=mode_kb)
 
     if not (message.text or "").isdigit():
-        return await message.answer("Введи номер з клавіатури.")
+        return await reply(message, "Введи номер з клавіатури.")
     idx = int(message.text) - 1
 
     data = await state.get_data()
     age, season, topic, op = data["age"], data["season"], data["topic"], data["op"]
-    topic_obj = ensure_topic_structure(menu_data[age][season][topic])
-    msgs = topic_obj["messages"]
+    topic_obj = menu.topic(age, season, topic)
+    msgs = topic_obj.messages
 
     if idx < 0 or idx >= len(msgs):
-        return await message.answer("Невірний номер.")
+        return await reply(message, "Невірний номер.")
 
     await state.update_data(index=idx)
 
@@ -515,44 +1036,177 @@ async def admin_msgs_pick_index(message: types.Message, state: FSMContext):
         await AdminMsgStates.content.set()
         prev = msgs[idx]
         preview = prev if len(prev) < 900 else prev[:900] + "…"
-        return await message.answer(
+        return await reply(
+            message,
             "Надішли НОВИЙ текст для цього повідомлення (старий заміниться повністю):\n\n" + preview,
-            reply_markup=ReplyKeyboardRemove()
+            reply_markup=remove_kb
         )
     else:
         # delete
-        del msgs[idx]
-        save_menu(menu_data)
+        topic_obj.messages = msgs[:idx] + msgs[idx + 1:]
+        content_store.delete_message(age, season, topic, idx)
+        refresh_topic(age, season, topic)
         await AdminMsgStates.mode.set()
-        return await message.answer("✅ Повідомлення видалено.", reply_markup=make_mode_kb())
+        return await reply(message, "✅ Повідомлення видалено.", reply_markup=mode_kb)
 
-@dp.message_handler(state=AdminMsgStates.content)
+@router.fallback(AdminMsgStates.content)
 async def admin_msgs_save_content(message: types.Message, state: FSMContext):
     data = await state.get_data()
     age, season, topic = data["age"], data["season"], data["topic"]
-    topic_obj = ensure_topic_structure(menu_data[age][season][topic])
-    msgs = topic_obj["messages"]
+    topic_obj = menu.topic(age, season, topic)
+    msgs = topic_obj.messages
 
     new_text = (message.text or "").strip()
     if not new_text:
-        return await message.answer("⚠️ Текст не може бути порожнім. Спробуй ще раз:")
+        return await reply(message, "⚠️ Текст не може бути порожнім. Спробуй ще раз:")
 
     idx = data.get("index", None)
     if idx is None:
         # ADD
-        msgs.append(new_text)
-        save_menu(menu_data)
+        topic_obj.messages = (*msgs, new_text)
+        content_store.set_message(age, season, topic, len(msgs), new_text)
+        refresh_topic(age, season, topic)
         await AdminMsgStates.mode.set()
-        return await message.answer("✅ Повідомлення додано.", reply_markup=make_mode_kb())
+        return await reply(message, "✅ Повідомлення додано.", reply_markup=mode_kb)
     else:
         # EDIT
-        msgs[idx] = new_text
-        save_menu(menu_data)
+        topic_obj.messages = (*msgs[:idx], new_text, *msgs[idx + 1:])
+        content_store.set_message(age, season, topic, idx, new_text)
+        refresh_topic(age, season, topic)
         await state.update_data(index=None)
         await AdminMsgStates.mode.set()
-        return await message.answer("✅ Повідомлення оновлено.", reply_markup=make_mode_kb())
+        return await reply(message, "✅ Повідомлення оновлено.", reply_markup=mode_kb)
+
+# ==== ROUTING ====
+
+# реєструється останнім: команди вище мають пріоритет над кнопками й текстом
+router.register(dp)
+
+# ==== HOT RELOAD ====
+
+def read_menu_with_caches():
+    """Виконується в потоці: нове меню з файлу разом з усіма похідними кешами."""
+    data, migrated = content_store.read()
+    return (data, migrated, *build_caches(data))
+
+def install_menu(data, caches):
+    """Підмінити меню й кеші одним кроком event loop (без await посередині)."""
+    global menu, render_cache, nav_index, keyboards, inline_keyboards, search_index, menu_generation
+    menu = data
+    menu_generation += 1
+    render_cache, nav_index, keyboards, inline_keyboards, search_index = caches
+    router.set_choices(MenuStates.age, menu.ages.keys(), choose_season)
+
+def swap_menu(prepared):
+    data, migrated, *caches, assigned = prepared
+    install_menu(data, caches)
+    content_store.replace(data)
+    # меню щойно перечитане: повний перезапис (save_all) затер би правки, які інший процес
+    # встиг зробити після читання, тож пишемо лише видані ID; міграцію повертає тільки JSON-файл
+    if migrated:
+        save_menu(menu)
+    elif assigned:
+        content_store.save_topic_ids(assigned)
+
+def prepare_import(base, doc):
+    """У потоці: меню base + документ → (меню, звіт, кеші)."""
+    data, report = merge(base, doc)
+    *caches, _ = build_caches(data)  # нові ID збереже save_all разом з усім меню
+    return data, report, caches
+
+async def apply_import(doc):
+    """
+    Документ імпорту → нове меню. merge і кеші рахуються в потоці, а підміна й збереження одним
+    записом (save_all) — на event loop, лише якщо меню за цей час не змінилось (правка адмінки,
+    перечитування); інакше рахуємо знову від свіжого. None — меню так і не вдалося застати незмінним.
+    """
+    loop = asyncio.get_running_loop()
+    for _ in range(IMPORT_ATTEMPTS):
+        base, generation = menu, menu_generation
+        try:
+            data, report, caches = await loop.run_in_executor(None, prepare_import, base, doc)
+        except RuntimeError:  # меню змінили просто під час знімка (dict changed size)
+            continue
+        if menu is base and menu_generation == generation:
+            install_menu(data, caches)
+            save_menu(menu)
+            return report
+        logging.info("Меню змінилось під час імпорту — рахую заново")
+    return None
+
+# MENU_WATCH_INTERVAL=0 вимикає стеження; для SQLite-сховища файл не є джерелом даних
+# для SQLite стежимо за версією контенту: так воркери бачать правки одне одного
+menu_watcher = None
+if float(os.getenv("MENU_WATCH_INTERVAL", "2")) > 0:
+    if isinstance(content_store, JsonContentStore):
+        menu_watcher = MenuWatcher(
+            lambda: file_signature(MENU_FILE), read_menu_with_caches, swap_menu,
+            interval=float(os.getenv("MENU_WATCH_INTERVAL", "2")),
+            own_signature=lambda: content_store.persister.signature,
+            busy=lambda: content_store.persister.pending,
+            name=MENU_FILE,
+        )
+    else:
+        menu_watcher = MenuWatcher(
+            content_store.version, read_menu_with_caches, swap_menu,
+            interval=float(os.getenv("MENU_WATCH_INTERVAL", "2")),
+            own_signature=lambda: content_store.own_version,
+            name=content_store.path,
+        )
 
 # ==== RUN ====
 
+def resume_broadcasts():
+    """Розсилки, перервані зупинкою, продовжуються з недоставлених отримувачів."""
+    for broadcast, topic_id, topic in broadcasts.unfinished(WORKER_INDEX):
+        logging.info("Продовжую розсилку #%s «%s»", broadcast, topic)
+        broadcaster.start(broadcast, announcement(topic_id), on_done=report_broadcast)
+
+async def on_startup(dp: Dispatcher):
+    # polling: executor уже виконав getMe і перше опитування getUpdates (skip_updates);
+    # webhook: сервер слухає порт і (за наявності адреси) webhook зареєстровано
+    # worker: приймальник чекає на «ready», апдейти підуть одразу після нього
+    boot.mark("ready" if BOT_ROLE == "worker" else "listen" if BOT_MODE == "webhook" else "first poll")
+    logging.info("Старт: %s", boot.report())
+    if menu_watcher is not None:
+        menu_watcher.start()
+    global metrics_runner, metrics_log_task
+    if METRICS_PORT:
+        metrics_runner = await metrics.start_server(os.getenv("METRICS_HOST", "127.0.0.1"), METRICS_PORT)
+    if METRICS_LOG_INTERVAL > 0:
+        metrics_log_task = asyncio.get_running_loop().create_task(metrics.log_periodically(METRICS_LOG_INTERVAL))
+    resume_broadcasts()
+
+async def on_shutdown(dp: Dispatcher):
+    if menu_watcher is not None:
+        await menu_watcher.close()
+    if metrics_log_task is not None:
+        metrics_log_task.cancel()
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+    await broadcaster.close()
+    await sender.close()
+    await content_store.close()
+    broadcasts.close()
+
 if __name__ == "__main__":
-    executor.start_polling(dp, skip_updates=True)
+    logging.basicConfig(level=logging.INFO)
+    if BOT_ROLE == "worker":
+        run_worker(dp, on_startup=on_startup, on_shutdown=on_shutdown)
+    elif BOT_MODE == "webhook":
+        webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+        webhook_base = os.getenv("WEBHOOK_BASE_URL")  # https://… без шляху; без неї — лише локальний сервер
+        run_webhook(
+            dp,
+            WebhookServer(
+                dp, path=webhook_path, secret=os.getenv("WEBHOOK_SECRET"),
+                max_in_flight=int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", str(MAX_IN_FLIGHT))),
+            ),
+            host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", "8080")),
+            url=webhook_base.rstrip("/") + webhook_path if webhook_base else None,
+            on_startup=on_startup,
+            on_shutdown=on_shutdown,
+        )
+    else:
+        executor.start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
@@ -0,0 +1,242 @@
+"""
+Підписки батьків на вікові категорії й розсилка нових тем підписникам.
+
+Список отримувачів фіксується в момент запуску розсилки, а кожен доставлений чат
+одразу позначається в БД — після рестарту розсилка продовжується з тих, хто ще
+не отримав тему, а не починається спочатку.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+
+from aiogram.utils.exceptions import BotBlocked, BotKicked, CantInitiateConversation, ChatNotFound, UserDeactivated
+
+log = logging.getLogger(__name__)
+
+WINDOW = 20  # отримувачів одночасно
+CLOSE_TIMEOUT = 10  # секунд при зупинці, щоб дослати вже розпочатим отримувачам
+
+PENDING, SENT, FAILED = 0, 1, 2
+# чат, куди бот більше не може писати: підписку знімаємо, щоб не ганяти наступні розсилки
+GONE = (BotBlocked, BotKicked, CantInitiateConversation, ChatNotFound, UserDeactivated)
+
+
+class BroadcastStore:
+    """Підписки, розсилки й стан доставки кожному отримувачу — у SQLite (WAL)."""
+
+    def __init__(self, path: str = "broadcast.sqlite3"):
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            " chat INTEGER NOT NULL, age TEXT NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (chat, age));"
+            "CREATE INDEX IF NOT EXISTS subscriptions_age ON subscriptions (age);"
+            # тема — за стабільним ID (Topic.id), бо між зупинкою й продовженням її можуть перейменувати;
+            # age, season, topic — як було на момент запуску, для звітів
+            "CREATE TABLE IF NOT EXISTS broadcasts ("
+            " id INTEGER PRIMARY KEY, topic_id TEXT,"
+            " age TEXT NOT NULL, season TEXT NOT NULL, topic TEXT NOT NULL,"
+            " owner INTEGER NOT NULL, created REAL NOT NULL, finished REAL,"
+            " aborted INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS recipients ("
+            " broadcast INTEGER NOT NULL, chat INTEGER NOT NULL, status INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (broadcast, chat));"
+        )
+        # база першої версії: розсилки без topic_id при продовженні будуть скасовані (тему не знайти)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(broadcasts)")}
+        if "topic_id" not in columns:
+            self._db.execute("ALTER TABLE broadcasts ADD COLUMN topic_id TEXT")
+        if "aborted" not in columns:
+            self._db.execute("ALTER TABLE broadcasts ADD COLUMN aborted INTEGER NOT NULL DEFAULT 0")
+
+    # --- підписки ---
+
+    def subscribe(self, chat, age):
+        self._db.execute("INSERT OR IGNORE INTO subscriptions VALUES (?, ?, ?)", (chat, age, time.time()))
+
+    def unsubscribe(self, chat, age=None):
+        if age is None:
+            self._db.execute("DELETE FROM subscriptions WHERE chat = ?", (chat,))
+        else:
+            self._db.execute("DELETE FROM subscriptions WHERE chat = ? AND age = ?", (chat, age))
+
+    def subscriptions(self, chat) -> list:
+        return [age for age, in self._db.execute("SELECT age FROM subscriptions WHERE chat = ? ORDER BY created", (chat,))]
+
+    def subscribers(self, age) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM subscriptions WHERE age = ?", (age,)).fetchone()[0]
+
+    # --- розсилки ---
+
+    def create(self, topic_id, age, season, topic, owner: int = 0) -> int:
+        """Нова розсилка з поточними підписниками віку як отримувачами (однією транзакцією)."""
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            broadcast = self._db.execute(
+                "INSERT INTO broadcasts (topic_id, age, season, topic, owner, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (topic_id, age, season, topic, owner, time.time()),
+            ).lastrowid
+            self._db.execute(
+                "INSERT INTO recipients (broadcast, chat) SELECT ?, chat FROM subscriptions WHERE age = ?",
+                (broadcast, age),
+            )
+        return broadcast
+
+    def active(self, topic_id):
+        """ID незавершеної розсилки теми з цим Topic.id або None."""
+        row = self._db.execute(
+            "SELECT id FROM broadcasts WHERE topic_id = ? AND finished IS NULL", (topic_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def unfinished(self, owner: int = 0) -> list:
+        """[(id, topic_id, назва теми на момент запуску)] незавершених розсилок цього процесу."""
+        return self._db.execute(
+            "SELECT id, topic_id, topic FROM broadcasts WHERE finished IS NULL AND owner = ? ORDER BY id",
+            (owner,),
+        ).fetchall()
+
+    def remaining(self, broadcast) -> list:
+        return [chat for chat, in self._db.execute(
+            "SELECT chat FROM recipients WHERE broadcast = ? AND status = ? ORDER BY chat", (broadcast, PENDING))]
+
+    def counts(self, broadcast) -> dict:
+        counts = dict(self._db.execute(
+            "SELECT status, COUNT(*) FROM recipients WHERE broadcast = ? GROUP BY status", (broadcast,)))
+        return {
+            "total": sum(counts.values()),
+            "sent": counts.get(SENT, 0),
+            "failed": counts.get(FAILED, 0),
+        }
+
+    def mark(self, broadcast, chat, status: int):
+        self._db.execute("UPDATE recipients SET status = ? WHERE broadcast = ? AND chat = ?", (status, broadcast, chat))
+
+    def finish(self, broadcast):
+        self._db.execute("UPDATE broadcasts SET finished = ? WHERE id = ?", (time.time(), broadcast))
+
+    def abort(self, broadcast):
+        """Закрити розсилку, не доставивши решті: отримувачі лишаються PENDING, рядок — з позначкою aborted."""
+        self._db.execute("UPDATE broadcasts SET finished = ?, aborted = 1 WHERE id = ?", (time.time(), broadcast))
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": self._db.execute("SELECT COUNT(*) FROM subscriptions").fetchone()[0],
+            "subscribers": self._db.execute("SELECT COUNT(DISTINCT chat) FROM subscriptions").fetchone()[0],
+        }
+
+    def close(self):
+        self._db.close()
+
+
+class Broadcaster:
+    """
+    Розсилає вже розбиті на шматки тексти теми через SendScheduler масовими викликами:
+    ліміти Telegram (30/с на бота, сплески на чат, RetryAfter) і пріоритет живих відповідей
+    тримає він, а тут лише не більше window отримувачів у роботі одночасно.
+    """
+
+    def __init__(self, store: BroadcastStore, sender, window: int = WINDOW):
+        self.store = store
+        self.sender = sender
+        self.window = window
+        self.progress = {}  # id → {"total", "sent", "failed", "started"} активних розсилок
+        self._tasks = {}
+        self._closing = False
+
+    def start(self, broadcast, chunks, on_done=None):
+        """
+        Запустити (або продовжити) розсилку; on_done(звіт) — після завершення.
+        Порожні chunks (тему видалено чи в ній не лишилось тексту) скасовують розсилку: звіт з aborted=True.
+        """
+        task = asyncio.get_running_loop().create_task(self._run(broadcast, tuple(chunks), on_done))
+        self._tasks[broadcast] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast, None))
+        return task
+
+    async def _run(self, broadcast, chunks, on_done):
+        if not chunks:
+            self.store.abort(broadcast)
+            report = {"id": broadcast, "aborted": True, **self.store.counts(broadcast)}
+            log.warning("Розсилку %s скасовано: теми вже немає: %s", broadcast, report)
+            if on_done is not None:
+                await on_done(report)
+            return report
+        try:
+            report = await self._deliver_all(broadcast, chunks)
+        finally:
+            self.progress.pop(broadcast, None)
+        if report is None:
+            log.info("Розсилку %s зупинено, решта отримувачів — після рестарту", broadcast)
+            return None
+        log.info("Розсилка %s завершена: %s", broadcast, report)
+        if on_done is not None:
+            await on_done(report)
+        return report
+
+    async def _deliver_all(self, broadcast, chunks):
+        """Звіт про завершену розсилку або None, якщо її перервала зупинка."""
+        progress = self.progress[broadcast] = {**self.store.counts(broadcast), "started": time.monotonic()}
+        resumed = progress["sent"] + progress["failed"]
+        slots = asyncio.Semaphore(self.window)
+        sent_messages = 0
+
+        async def deliver(chat):
+            nonlocal sent_messages
+            async with slots:
+                if self._closing:
+                    return  # зупинка: отримувач лишається PENDING
+                try:
+                    await self.sender.send_messages(chat, chunks, bulk=True)
+                    status = SENT
+                    sent_messages += len(chunks)
+                except GONE:
+                    status = FAILED
+                    self.store.unsubscribe(chat)
+                except Exception:
+                    status = FAILED
+                    log.exception("Розсилка %s: не вдалося доставити в чат %s", broadcast, chat)
+                self.store.mark(broadcast, chat, status)
+                progress["sent" if status == SENT else "failed"] += 1
+
+        await asyncio.gather(*(deliver(chat) for chat in self.store.remaining(broadcast)))
+        if self._closing and self.store.remaining(broadcast):
+            return None
+        self.store.finish(broadcast)
+        elapsed = time.monotonic() - progress["started"]
+        return {
+            "id": broadcast,
+            "aborted": False,
+            "total": progress["total"],
+            "sent": progress["sent"],
+            "failed": progress["failed"],
+            "resumed": resumed,
+            "seconds": elapsed,
+            "messages_per_sec": sent_messages / elapsed if elapsed else 0.0,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.progress),
+            "done": sum(p["sent"] + p["failed"] for p in self.progress.values()),
+            "total": sum(p["total"] for p in self.progress.values()),
+        }
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT):
+        """
+        Зупинити розсилки: нових отримувачів не беремо, а вже розпочатих (до window на розсилку)
+        досилаємо й позначаємо — інакше після рестарту вони отримали б тему вдруге.
+        Недоставлені лишаються в БД для продовження; що не встигло за timeout — скасовується.
+        """
+        self._closing = True
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,189 @@
+"""
+Масовий імпорт і експорт контенту: один документ на вік або сезон замість десятків кроків адмінки.
+
+JSON — той самий формат, що й menu_data.json ({"schema_version": 2, "menu": {вік: {сезон: {тема: ...}}}}),
+лише з потрібною частиною меню. CSV — рядок на повідомлення: age,season,topic,message
+(порожній message — тема без повідомлень); медіа й посилання CSV не переносить.
+
+Імпорт додає нові теми й переписує наявні; теми, яких у документі немає, не чіпаються.
+"""
+import csv
+import io
+import json
+
+from content_store import SCHEMA_VERSION, ensure_topic_structure, unpack_menu
+from menu_model import TOPIC_FIELDS, Menu
+
+MAX_IMPORT_BYTES = 5 * 2 ** 20
+CSV_FIELDS = ("age", "season", "topic", "message")
+MEDIA_TYPES = ("photo", "document")
+LINK_SCHEMES = ("http://", "https://", "tg://")
+
+
+class BulkError(ValueError):
+    """Документ не пройшов перевірку; текст — для адміна, з місцем помилки."""
+
+
+# === Експорт ===
+
+def select(menu: Menu, age, season=None) -> dict:
+    """Частина меню: увесь вік або один сезон, у JSON-формі."""
+    seasons = menu.ages[age].seasons
+    return {age: {
+        title: {topic_title: topic.to_dict() for topic_title, topic in node.topics.items()}
+        for title, node in seasons.items() if season is None or title == season
+    }}
+
+
+def export_json(menu: Menu, age, season=None) -> bytes:
+    doc = {"schema_version": SCHEMA_VERSION, "menu": select(menu, age, season)}
+    return json.dumps(doc, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def export_csv(menu: Menu, age, season=None) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+    for age_title, seasons in select(menu, age, season).items():
+        for season_title, topics in seasons.items():
+            for title, topic in topics.items():
+                for text in topic["messages"] or ("",):
+                    writer.writerow((age_title, season_title, title, text))
+    # BOM — щоб Excel одразу відкрив кирилицю як UTF-8
+    return out.getvalue().encode("utf-8-sig")
+
+
+# === Імпорт ===
+
+def _title(value, where) -> str:
+    if not isinstance(value, str) or not value.strip():
+        raise BulkError(f"{where}: порожня назва")
+    return value.strip()
+
+
+def _items(obj, where):
+    if not isinstance(obj, dict):
+        raise BulkError(f"{where}: очікується об'єкт {{назва: ...}}")
+    for key, value in obj.items():
+        yield _title(key, where), value
+
+
+def validate_topic(obj, where) -> dict:
+    """
+    Тема з документа → лише ті з полів messages / media / links, що в ній є.
+    id ігнорується: ID теми лишається за наявною темою, новим темам його видасть NodeIndex.
+    """
+    if not isinstance(obj, dict):
+        raise BulkError(f"{where}: тема має бути об'єктом")
+    unknown = set(obj) - set(TOPIC_FIELDS)
+    if unknown:
+        raise BulkError(f"{where}: невідомі поля {', '.join(sorted(unknown))}")
+    topic = {}
+    if "messages" in obj:
+        messages = obj["messages"]
+        if not isinstance(messages, list) or not all(isinstance(text, str) and text.strip() for text in messages):
+            raise BulkError(f"{where}: messages — список непорожніх рядків")
+        topic["messages"] = messages
+    if "media" in obj:
+        media = obj["media"]
+        if not isinstance(media, list):
+            raise BulkError(f"{where}: media — список")
+        for i, item in enumerate(media, 1):
+            # path не приймаємо: імпорт не повинен розсилати файли з диска сервера
+            if (not isinstance(item, dict) or item.get("type") not in MEDIA_TYPES
+                    or not isinstance(item.get("file_id") or item.get("url"), str) or "path" in item
+                    or not isinstance(item.get("caption", ""), str)):
+                raise BulkError(f"{where}: медіа {i} — {{\"type\": \"photo\"|\"document\", \"file_id\" або \"url\"}}")
+        topic["media"] = media
+    if "links" in obj:
+        links = obj["links"]
+        if not isinstance(links, list):
+            raise BulkError(f"{where}: links — список")
+        for i, link in enumerate(links, 1):
+            if (not isinstance(link, dict) or not isinstance(link.get("title"), str)
+                    or not isinstance(link.get("url"), str) or not link["url"].startswith(LINK_SCHEMES)):
+                raise BulkError(f"{where}: посилання {i} — {{\"title\": ..., \"url\": \"https://...\"}}")
+        topic["links"] = links
+    return topic
+
+
+def parse_json(stream) -> dict:
+    """
+    Документ → {вік: {сезон: {тема: поля}}}. Стандартний json не вміє читати частинами,
+    тож розмір обмежує MAX_IMPORT_BYTES ще до завантаження файлу.
+    """
+    try:
+        raw = json.load(io.TextIOWrapper(stream, encoding="utf-8-sig"))
+    except ValueError as e:
+        raise BulkError(f"Некоректний JSON: {e}")
+    if not isinstance(raw, dict):
+        raise BulkError("Очікується об'єкт {\"schema_version\": ..., \"menu\": {...}}")
+    data, version = unpack_menu(raw)
+    doc = {}
+    for age, seasons in _items(data, "меню"):
+        for season, topics in _items(seasons, age):
+            for title, obj in _items(topics, f"{age} / {season}"):
+                where = f"{age} / {season} / {title}"
+                if version < SCHEMA_VERSION and isinstance(obj, dict):
+                    obj = ensure_topic_structure(obj)
+                    obj.pop("text", None)
+                doc.setdefault(age, {}).setdefault(season, {})[title] = validate_topic(obj, where)
+    return doc
+
+
+def parse_csv(stream) -> dict:
+    """Рядок за рядком, без читання всього файлу в пам'ять; помилка — з номером рядка."""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    doc = {}
+    try:
+        header = next(reader, None)
+        if header is None or tuple(cell.strip().lower() for cell in header) != CSV_FIELDS:
+            raise BulkError(f"Перший рядок CSV має бути заголовком: {','.join(CSV_FIELDS)}")
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if len(row) != len(CSV_FIELDS):
+                raise BulkError(f"Рядок {reader.line_num}: очікується {len(CSV_FIELDS)} колонки, а не {len(row)}")
+            age, season, title = (_title(cell, f"Рядок {reader.line_num}") for cell in row[:3])
+            topic = doc.setdefault(age, {}).setdefault(season, {}).setdefault(title, {"messages": []})
+            if row[3].strip():
+                topic["messages"].append(row[3].strip())
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise BulkError(f"Некоректний CSV: {e}")
+    return doc
+
+
+def parse_document(filename: str, stream) -> dict:
+    """Формат — за розширенням файлу."""
+    name = (filename or "").lower()
+    if name.endswith(".json"):
+        doc = parse_json(stream)
+    elif name.endswith(".csv"):
+        doc = parse_csv(stream)
+    else:
+        raise BulkError("Підтримуються лише файли .json і .csv")
+    if not doc:
+        raise BulkError("У документі немає жодної теми")
+    return doc
+
+
+def merge(menu: Menu, doc: dict):
+    """
+    Нове меню = поточне + документ; поточне не змінюється.
+    Повертає (Menu, {"added", "updated", "messages"}).
+    """
+    data = menu.to_dict()
+    added = updated = messages = 0
+    for age, seasons in doc.items():
+        for season, topics in seasons.items():
+            target = data.setdefault(age, {}).setdefault(season, {})
+            for title, fields in topics.items():
+                current = target.get(title)
+                if current is None:
+                    added += 1
+                    target[title] = {"messages": [], "media": [], "links": [], **fields}
+                else:
+                    updated += 1
+                    current.update(fields)
+                messages += len(target[title]["messages"])
+    return Menu.from_dict(data), {"added": added, "updated": updated, "messages": messages}
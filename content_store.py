@@ -0,0 +1,376 @@
+"""
+Сховище контенту меню: JSON-файл цілком або SQLite з індексом (вік, сезон, тема, позиція).
+
+python content_store.py import menu_data.json content.sqlite3  — одноразовий імпорт
+python content_store.py export content.sqlite3 menu_data.json  — вивантаження назад у JSON
+"""
+import json
+import sqlite3
+import sys
+
+from menu_model import Menu, Topic
+from persistence import MenuPersister, write_json_atomic
+
+
+# === Schema migration ===
+
+def ensure_topic_structure(topic_obj: dict):
+    """
+    Міграція зі старого формату:
+      {'text': '...'} →
+      {'messages': ['...'], 'media': [], 'links': []}
+    і гарантія ключів у новому форматі.
+    """
+    if topic_obj is None:
+        return {"messages": [], "media": [], "links": []}
+    if "messages" not in topic_obj:
+        msgs = []
+        if topic_obj.get("text"):
+            msgs.append(topic_obj["text"])
+        topic_obj["messages"] = msgs
+    topic_obj.setdefault("media", [])
+    topic_obj.setdefault("links", [])
+    return topic_obj
+
+
+def migrate_menu_schema(data: dict):
+    """Пройтись по всіх темах і гарантувати наявність messages[]; старе поле text більше не потрібне."""
+    for age_key, seasons in data.items():
+        for season_key, topics in seasons.items():
+            for topic_key, topic_obj in list(topics.items()):
+                topic_obj = topics[topic_key] = ensure_topic_structure(topic_obj)
+                topic_obj.pop("text", None)
+    return data
+
+
+# Версія схеми. Файл: {"schema_version": N, "menu": {вік: {сезон: {тема: ...}}}};
+# файл без обгортки — версія 1 (до міграції). Дані з актуальною версією не обходяться
+# міграцією на старті й одразу стають моделлю Menu (див. menu_model.py).
+SCHEMA_VERSION = 2
+
+
+def unpack_menu(raw: dict):
+    """Вміст файлу → (дерево меню, версія схеми)."""
+    if isinstance(raw.get("schema_version"), int) and isinstance(raw.get("menu"), dict):
+        return raw["menu"], raw["schema_version"]
+    return raw, 1
+
+
+def pack_menu(menu: Menu) -> dict:
+    """Menu → вміст файлу (новий dict-знімок, можна писати з іншого потоку)."""
+    return {"schema_version": SCHEMA_VERSION, "menu": menu.to_dict()}
+
+
+def upgrade_menu(raw: dict):
+    """Вміст файлу → (дерево актуальної версії, чи довелося мігрувати)."""
+    data, version = unpack_menu(raw)
+    if version >= SCHEMA_VERSION:
+        return data, False
+    return migrate_menu_schema(data), True
+
+
+def read_menu_file(path: str) -> Menu:
+    """Прочитати JSON меню будь-якої версії."""
+    with open(path, encoding="utf-8") as f:
+        return Menu.from_dict(upgrade_menu(json.load(f))[0])
+
+
+# === JSON ===
+
+class JsonContentStore:
+    """
+    Увесь контент в одному JSON-файлі: будь-яка правка планує повний перезапис
+    (відкладений і згрупований MenuPersister'ом).
+    """
+
+    def __init__(self, path: str, delay: float = 1.0):
+        self.path = path
+        self.persister = MenuPersister(path, delay=delay, snapshot=pack_menu)
+        self.menu = None
+
+    def parse(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def migrate(self, raw: dict) -> Menu:
+        """Прийняти розібраний файл як поточне меню; міграція старої версії зберігається одразу."""
+        self.menu, migrated = self.build(raw)
+        if migrated:
+            self._changed()
+        return self.menu
+
+    def load(self) -> Menu:
+        return self.migrate(self.parse())
+
+    @staticmethod
+    def build(raw: dict):
+        data, migrated = upgrade_menu(raw)
+        return Menu.from_dict(data), migrated
+
+    def read(self):
+        """(Menu, чи мігровано) з файлу, не чіпаючи поточного меню — можна з іншого потоку."""
+        return self.build(self.parse())
+
+    def replace(self, menu: Menu):
+        """Прийняти меню, перечитане з файлу (гаряче перезавантаження), без запису назад."""
+        self.menu = menu
+
+    def save_all(self, menu: Menu):
+        self.menu = menu
+        self._changed()
+
+    def _changed(self, *args):
+        self.persister.schedule(self.menu)
+
+    save_topic = save_topic_ids = delete_topic = rename_topic = set_message = delete_message = _changed
+
+    def stats(self) -> dict:
+        return {"requests": self.persister.requests, "writes": self.persister.writes}
+
+    async def close(self):
+        await self.persister.close()
+
+
+# === SQLite ===
+
+def _topic_extra(topic: Topic) -> str:
+    """Усе, крім messages (id, media, links і невідомі поля), — одним JSON-полем."""
+    obj = topic.to_dict()
+    del obj["messages"]
+    return json.dumps(obj, ensure_ascii=False)
+
+
+class SQLiteContentStore:
+    """
+    Меню в SQLite (WAL). Порядок віків, сезонів, тем і повідомлень — явні позиції,
+    тож load() відтворює дерево точно як у JSON.
+    Кожна правка в адмінці — одна коротка транзакція лише по зачеплених рядках
+    замість перезапису всього меню.
+
+    Кожен запис також збільшує лічильник версії контенту (таблиця meta) — за ним
+    інші процеси з тією ж базою дізнаються, що треба перечитати меню (див. workers.py).
+    seen — версія, яку відображає меню цього процесу; own_version — версія після
+    нашого останнього запису, якщо між ним і seen не було чужих записів.
+    """
+
+    def __init__(self, path: str = "content.sqlite3"):
+        self.path = path
+        self.writes = 0
+        self.seen = self.own_version = None
+        self._read_version = None
+        self._db = self._connect()
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS ages ("
+            " age TEXT PRIMARY KEY, position INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS seasons ("
+            " age TEXT NOT NULL, season TEXT NOT NULL, position INTEGER NOT NULL,"
+            " PRIMARY KEY (age, season));"
+            "CREATE TABLE IF NOT EXISTS topics ("
+            " age TEXT NOT NULL, season TEXT NOT NULL, topic TEXT NOT NULL,"
+            " position INTEGER NOT NULL, extra TEXT NOT NULL DEFAULT '{}',"
+            " PRIMARY KEY (age, season, topic));"
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " age TEXT NOT NULL, season TEXT NOT NULL, topic TEXT NOT NULL,"
+            " position INTEGER NOT NULL, text TEXT NOT NULL,"
+            " PRIMARY KEY (age, season, topic, position));"
+            "CREATE TABLE IF NOT EXISTS meta ("
+            " key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO meta VALUES ('content_version', 0);"
+        )
+
+    def _connect(self):
+        # кілька воркерів пишуть в один файл: чекаємо на чужу транзакцію замість помилки
+        db = sqlite3.connect(self.path, isolation_level=None, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def version(self) -> int:
+        return self._db.execute("SELECT value FROM meta WHERE key = 'content_version'").fetchone()[0]
+
+    def _bump_version(self):
+        """Усередині транзакції запису: +1 до версії контенту."""
+        current = self.version()
+        self._db.execute("UPDATE meta SET value = ? WHERE key = 'content_version'", (current + 1,))
+        if current == self.seen:
+            self.seen = self.own_version = current + 1
+
+    def is_empty(self) -> bool:
+        return self._db.execute("SELECT 1 FROM ages LIMIT 1").fetchone() is None
+
+    @staticmethod
+    def _parse(db):
+        """(дерево, версія контенту) одним узгодженим знімком бази."""
+        data = {}
+        with db:
+            db.execute("BEGIN")
+            version = db.execute("SELECT value FROM meta WHERE key = 'content_version'").fetchone()[0]
+            for age, in db.execute("SELECT age FROM ages ORDER BY position"):
+                data[age] = {}
+            for age, season in db.execute(
+                    "SELECT age, season FROM seasons ORDER BY position"):
+                data.setdefault(age, {})[season] = {}
+            for age, season, topic, extra in db.execute(
+                    "SELECT age, season, topic, extra FROM topics ORDER BY position"):
+                topic_obj = json.loads(extra)
+                topic_obj["messages"] = []
+                data.setdefault(age, {}).setdefault(season, {})[topic] = topic_obj
+            for age, season, topic, text in db.execute(
+                    "SELECT age, season, topic, text FROM messages ORDER BY age, season, topic, position"):
+                data[age][season][topic]["messages"].append(text)
+        return data, version
+
+    def parse(self) -> dict:
+        data, self.seen = self._parse(self._db)
+        return data
+
+    def migrate(self, data: dict) -> Menu:
+        """Версія схеми — у PRAGMA user_version; стару базу мігруємо й перезаписуємо один раз."""
+        if self._db.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return Menu.from_dict(data)
+        menu = Menu.from_dict(migrate_menu_schema(data))
+        self.save_all(menu)
+        return menu
+
+    def load(self) -> Menu:
+        return self.migrate(self.parse())
+
+    def read(self):
+        """
+        (Menu, чи мігровано) — свіжий знімок з бази для гарячого перезавантаження.
+        Виконується в потоці, тож через окреме з'єднання; міграцію вже зробив той, хто писав.
+        """
+        db = self._connect()
+        try:
+            data, self._read_version = self._parse(db)
+        finally:
+            db.close()
+        return Menu.from_dict(data), False
+
+    def replace(self, menu: Menu):
+        """Меню з read() стало поточним: воно відображає прочитану версію."""
+        self.seen = self._read_version
+
+    def _write(self, statements):
+        """Виконати [(sql, params), ...] однією транзакцією."""
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            for sql, params in statements:
+                self._db.execute(sql, params)
+            self._bump_version()
+        self.writes += 1
+
+    def save_all(self, menu: Menu):
+        """Повністю замінити вміст (імпорт, масові зміни)."""
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            for table in ("ages", "seasons", "topics", "messages"):
+                self._db.execute(f"DELETE FROM {table}")
+            for age_pos, (age, age_node) in enumerate(menu.ages.items()):
+                self._db.execute("INSERT INTO ages VALUES (?, ?)", (age, age_pos))
+                for season_pos, (season, season_node) in enumerate(age_node.seasons.items()):
+                    self._db.execute("INSERT INTO seasons VALUES (?, ?, ?)", (age, season, season_pos))
+                    for topic_pos, (title, topic) in enumerate(season_node.topics.items()):
+                        self._db.execute("INSERT INTO topics VALUES (?, ?, ?, ?, ?)",
+                                         (age, season, title, topic_pos, _topic_extra(topic)))
+                        self._db.executemany(
+                            "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                            [(age, season, title, i, text) for i, text in enumerate(topic.messages)],
+                        )
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._bump_version()
+        self.writes += 1
+
+    def save_topic(self, age, season, topic, topic_obj: Topic):
+        """Створити або повністю переписати одну тему (позиція існуючої зберігається)."""
+        key = (age, season, topic)
+        statements = [
+            ("INSERT OR IGNORE INTO ages VALUES (?, (SELECT COUNT(*) FROM ages))", (age,)),
+            ("INSERT OR IGNORE INTO seasons VALUES (?, ?,"
+             " (SELECT COUNT(*) FROM seasons WHERE age = ?))", (age, season, age)),
+            ("INSERT INTO topics VALUES (?, ?, ?,"
+             " (SELECT COALESCE(MAX(position) + 1, 0) FROM topics WHERE age = ? AND season = ?), ?)"
+             " ON CONFLICT (age, season, topic) DO UPDATE SET extra = excluded.extra",
+             (*key, age, season, _topic_extra(topic_obj))),
+            ("DELETE FROM messages WHERE age = ? AND season = ? AND topic = ?", key),
+        ]
+        statements += [("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", (*key, i, text))
+                       for i, text in enumerate(topic_obj.messages)]
+        self._write(statements)
+
+    def save_topic_ids(self, assigned):
+        """
+        Записати щойно видані ID тем [(age, season, topic, id)] — лише поле id і лише там, де його ще немає:
+        тему, яку тим часом змінив чи видалив інший процес, не переписуємо.
+        """
+        self._write([
+            ("UPDATE topics SET extra = json_set(extra, '$.id', ?)"
+             " WHERE age = ? AND season = ? AND topic = ? AND json_extract(extra, '$.id') IS NULL",
+             (topic_id, age, season, topic))
+            for age, season, topic, topic_id in assigned
+        ])
+
+    def delete_topic(self, age, season, topic):
+        key = (age, season, topic)
+        self._write([
+            ("DELETE FROM messages WHERE age = ? AND season = ? AND topic = ?", key),
+            ("DELETE FROM topics WHERE age = ? AND season = ? AND topic = ?", key),
+        ])
+
+    def rename_topic(self, age, season, old_topic, new_topic):
+        if new_topic == old_topic:
+            return
+        params = (new_topic, age, season, old_topic)
+        target = (age, season, new_topic)
+        self._write([
+            # як і в Menu.rename_topic: тема з такою назвою, якщо була, замінюється
+            ("DELETE FROM messages WHERE age = ? AND season = ? AND topic = ?", target),
+            ("DELETE FROM topics WHERE age = ? AND season = ? AND topic = ?", target),
+            ("UPDATE topics SET topic = ? WHERE age = ? AND season = ? AND topic = ?", params),
+            ("UPDATE messages SET topic = ? WHERE age = ? AND season = ? AND topic = ?", params),
+        ])
+
+    def set_message(self, age, season, topic, index: int, text: str):
+        """Замінити повідомлення index або дописати нове (index == кількість)."""
+        self._write([("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)",
+                      (age, season, topic, index, text))])
+
+    def delete_message(self, age, season, topic, index: int):
+        key = (age, season, topic)
+        # зсув позицій через від'ємні значення, щоб не зачепити первинний ключ посеред UPDATE
+        self._write([
+            ("DELETE FROM messages WHERE age = ? AND season = ? AND topic = ? AND position = ?",
+             (*key, index)),
+            ("UPDATE messages SET position = -position WHERE age = ? AND season = ? AND topic = ?"
+             " AND position > ?", (*key, index)),
+            ("UPDATE messages SET position = -position - 1 WHERE age = ? AND season = ? AND topic = ?"
+             " AND position < 0", key),
+        ])
+
+    def stats(self) -> dict:
+        topics, messages = (self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                            for table in ("topics", "messages"))
+        return {"topics": topics, "messages": messages, "writes": self.writes, "version": self.version()}
+
+    def import_json(self, path: str):
+        """Одноразовий імпорт з menu_data.json (зокрема старого формату {'text': ...})."""
+        self.save_all(read_menu_file(path))
+
+    def export_json(self, path: str):
+        write_json_atomic(path, pack_menu(self.load()))
+
+    async def close(self):
+        self._db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        sys.exit(__doc__)
+    command, src, dst = sys.argv[1:]
+    if command == "import":
+        store = SQLiteContentStore(dst)
+        store.import_json(src)
+    else:
+        store = SQLiteContentStore(src)
+        store.export_json(dst)
+    print(store.stats())
@@ -0,0 +1,234 @@
+"""FSM-сховище на SQLite (WAL) з обмеженим кешем у пам'яті та пакетним записом."""
+import asyncio
+import copy
+import json
+import sqlite3
+import time
+import typing
+from collections import OrderedDict
+
+from aiogram.dispatcher.storage import BaseStorage
+
+
+def _empty_record(ts=0.0):
+    return {"state": None, "data": {}, "bucket": {}, "ts": ts}
+
+
+def _is_empty(record) -> bool:
+    return record["state"] is None and not record["data"] and not record["bucket"]
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Стани й дані FSM переживають рестарт воркера.
+    Читання йдуть через кеш у пам'яті (з БД — лише перше звертання чату),
+    а всі зміни за один «тік» event loop записуються однією транзакцією.
+
+    Кеш обмежений max_entries записами (LRU: витіснений чат просто перечитається з БД),
+    а сесії без активності довше за ttl секунд видаляються зовсім.
+    """
+
+    def __init__(self, path: str = "fsm.sqlite3", ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 10000, sweep_interval: float = 600):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            " chat TEXT NOT NULL, user TEXT NOT NULL,"
+            " state TEXT, data TEXT NOT NULL, bucket TEXT NOT NULL,"
+            " updated REAL NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (chat, user))"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(fsm)")}
+        if "updated" not in columns:
+            self._db.execute("ALTER TABLE fsm ADD COLUMN updated REAL NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS fsm_updated ON fsm (updated)")
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._flush_scheduled = False
+        self._last_sweep = time.time()
+        self.flushes = 0
+        self.lru_evictions = 0
+        self.expired = 0
+
+    # --- кеш і пакетний запис ---
+
+    def _record(self, chat, user) -> dict:
+        chat, user = map(str, self.check_address(chat=chat, user=user))
+        key = (chat, user)
+        now = time.time()
+        record = self._cache.get(key)
+        if record is None:
+            row = self._db.execute(
+                "SELECT state, data, bucket, updated FROM fsm WHERE chat = ? AND user = ?", key
+            ).fetchone()
+            if row is None:
+                record = _empty_record(now)
+            else:
+                record = {"state": row[0], "data": json.loads(row[1]),
+                          "bucket": json.loads(row[2]), "ts": row[3]}
+            self._cache[key] = record
+            self._evict_lru()
+        else:
+            self._cache.move_to_end(key)
+        if now - record["ts"] > self.ttl and not _is_empty(record):
+            # сесія простояла довше TTL — починаємо з чистого аркуша
+            record.update(_empty_record())
+            self._mark_dirty(key)
+            self.expired += 1
+        record["ts"] = now
+        return record
+
+    def _evict_lru(self):
+        if len(self._cache) <= self.max_entries:
+            return
+        if self._dirty:
+            self._flush()  # витіснений запис мусить уже бути в БД
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.lru_evictions += 1
+
+    def _touch(self, chat, user):
+        self._mark_dirty(tuple(map(str, self.check_address(chat=chat, user=user))))
+
+    def _mark_dirty(self, key):
+        self._dirty.add(key)
+        if self._flush_scheduled:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self._flush()
+        self._flush_scheduled = True
+        loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        upserts, deletes = [], []
+        for key in dirty:
+            record = self._cache.get(key)
+            if record is None or _is_empty(record):
+                deletes.append(key)
+            else:
+                upserts.append((
+                    *key, record["state"],
+                    json.dumps(record["data"], ensure_ascii=False),
+                    json.dumps(record["bucket"], ensure_ascii=False),
+                    record["ts"],
+                ))
+        with self._db:
+            self._db.execute("BEGIN")
+            if deletes:
+                self._db.executemany("DELETE FROM fsm WHERE chat = ? AND user = ?", deletes)
+            if upserts:
+                self._db.executemany("INSERT OR REPLACE INTO fsm VALUES (?, ?, ?, ?, ?, ?)", upserts)
+        self.flushes += 1
+        if time.time() - self._last_sweep > self.sweep_interval:
+            self.sweep()
+
+    def sweep(self):
+        """Видалити з БД і кешу всі сесії, неактивні довше за TTL."""
+        now = time.time()
+        self._last_sweep = now
+        deadline = now - self.ttl
+        with self._db:
+            removed = self._db.execute("DELETE FROM fsm WHERE updated < ?", (deadline,)).rowcount
+        stale = [key for key, record in self._cache.items()
+                 if record["ts"] < deadline and key not in self._dirty]
+        for key in stale:
+            del self._cache[key]
+        self.expired += removed
+        return removed
+
+    def stats(self) -> dict:
+        stored = self._db.execute("SELECT COUNT(*) FROM fsm").fetchone()[0]
+        return {
+            "cached": len(self._cache),
+            "stored": stored,
+            "lru_evictions": self.lru_evictions,
+            "expired": self.expired,
+        }
+
+    async def close(self):
+        self._flush()
+        self._cache.clear()
+
+    async def wait_closed(self):
+        self._db.close()
+
+    # --- BaseStorage ---
+
+    async def get_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        state = self._record(chat, user)["state"]
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[dict] = None) -> typing.Dict:
+        return copy.deepcopy(self._record(chat, user)["data"])
+
+    async def set_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.AnyStr = None):
+        self._record(chat, user)["state"] = self.resolve_state(state)
+        self._touch(chat, user)
+
+    async def set_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        self._record(chat, user)["data"] = copy.deepcopy(data or {})
+        self._touch(chat, user)
+
+    async def update_data(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None, **kwargs):
+        self._record(chat, user)["data"].update(data or {}, **kwargs)
+        self._touch(chat, user)
+
+    async def reset_state(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          with_data: typing.Optional[bool] = True):
+        record = self._record(chat, user)
+        record["state"] = None
+        if with_data:
+            record["data"] = {}
+        self._touch(chat, user)
+
+    def has_bucket(self):
+        return True
+
+    async def get_bucket(self, *,
+                         chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         default: typing.Optional[dict] = None) -> typing.Dict:
+        return copy.deepcopy(self._record(chat, user)["bucket"])
+
+    async def set_bucket(self, *,
+                         chat: typing.Union[str, int, None] = None,
+                         user: typing.Union[str, int, None] = None,
+                         bucket: typing.Dict = None):
+        self._record(chat, user)["bucket"] = copy.deepcopy(bucket or {})
+        self._touch(chat, user)
+
+    async def update_bucket(self, *,
+                            chat: typing.Union[str, int, None] = None,
+                            user: typing.Union[str, int, None] = None,
+                            bucket: typing.Dict = None, **kwargs):
+        self._record(chat, user)["bucket"].update(bucket or {}, **kwargs)
+        self._touch(chat, user)
@@ -0,0 +1,143 @@
+"""Реєстр клавіатур навігації: розмітка будується й серіалізується один раз."""
+import json
+from functools import lru_cache
+
+from aiogram.types import (
+    InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup,
+)
+
+BACK = "⬅️ Назад"
+ADMIN_PANEL = "🛠 Адмін панель"
+
+
+def make_keyboard(options, add_back=True):
+    kb = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    for opt in options:
+        kb.add(KeyboardButton(opt))
+    if add_back:
+        kb.add(KeyboardButton(BACK))
+    return kb
+
+
+def freeze(markup) -> str:
+    """
+    Серіалізувати розмітку в JSON-рядок.
+    aiogram передає рядковий reply_markup в Bot API як є, без повторного json.dumps.
+    """
+    return json.dumps(markup.to_python(), ensure_ascii=False)
+
+
+@lru_cache(maxsize=64)
+def index_keyboard(count: int) -> str:
+    """Клавіатура з номерами 1..count для вибору повідомлення теми."""
+    kb = ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
+    for i in range(1, count + 1):
+        kb.add(KeyboardButton(str(i)))
+    kb.add(KeyboardButton(BACK))
+    return freeze(kb)
+
+
+class KeyboardRegistry:
+    """
+    Готові серіалізовані клавіатури для кожного вузла дерева вік → сезон → тема.
+    Перебудовується лише при зміні структури меню (нова/видалена/перейменована тема).
+    """
+
+    def __init__(self):
+        self.start = None        # /start для батьків
+        self.start_admin = None  # /start для адміна (+ «🛠 Адмін панель»)
+        self.ages = None         # вибір віку в адмінці (з «Назад»)
+        self._seasons = {}
+        self._topics = {}
+
+    def rebuild(self, menu):
+        ages = list(menu.ages)
+        self.start = freeze(make_keyboard(ages, add_back=False))
+        self.start_admin = freeze(make_keyboard(ages + [ADMIN_PANEL], add_back=False))
+        self.ages = freeze(make_keyboard(ages))
+        self._seasons = {age: freeze(make_keyboard(node.seasons)) for age, node in menu.ages.items()}
+        self._topics = {}
+        for age, node in menu.ages.items():
+            for season in node.seasons:
+                self.refresh_season(menu, age, season)
+
+    def refresh_season(self, menu, age, season):
+        """Перебудувати лише список тем одного сезону."""
+        self._topics[(age, season)] = freeze(make_keyboard(menu.season(age, season).topics))
+
+    def seasons(self, age) -> str:
+        return self._seasons[age]
+
+    def topics(self, age, season) -> str:
+        return self._topics[(age, season)]
+
+
+# --- Inline-навігація (NAV_MODE=inline) ---
+# callback_data: "home" — вікові категорії, "a:<age_id>" — сезони віку,
+# "s:<age_id>:<season_id>" — теми сезону, "t:<topic_id>" — показати тему,
+# "p:<topic_id>" — «Текст для батьків», "admin" — адмін-панель.
+
+def make_inline_keyboard(items, back=None):
+    """items — пари (текст, callback_data); back — callback_data кнопки «Назад»."""
+    kb = InlineKeyboardMarkup(row_width=1)
+    for text, data in items:
+        kb.add(InlineKeyboardButton(text, callback_data=data))
+    if back is not None:
+        kb.add(InlineKeyboardButton(BACK, callback_data=back))
+    return kb
+
+
+class InlineKeyboardRegistry:
+    """Те саме, що KeyboardRegistry, але inline-клавіатури з callback_data на основі NodeIndex."""
+
+    def __init__(self, index):
+        self.index = index
+        self.start = None
+        self.start_admin = None
+        self.subscribe = None
+        self._seasons = {}
+        self._topics = {}
+        self._done = {}
+
+    def rebuild(self, menu):
+        ages = [(age, f"a:{self.index.age_id(age)}") for age in menu.ages]
+        self.start = freeze(make_inline_keyboard(ages))
+        self.start_admin = freeze(make_inline_keyboard(ages + [(ADMIN_PANEL, "admin")]))
+        # /subscribe: однакова в обох режимах навігації, кнопки обробляє bot.nav_callback
+        self.subscribe = freeze(make_inline_keyboard(
+            [(f"🔔 {age}", f"sub:{self.index.age_id(age)}") for age in menu.ages]
+            + [("🔕 Відписатися від усіх", "unsub")]
+        ))
+        self._seasons = {}
+        self._topics = {}
+        for age, node in menu.ages.items():
+            aid = self.index.age_id(age)
+            self._seasons[age] = freeze(make_inline_keyboard(
+                [(season, f"s:{aid}:{self.index.season_id(age, season)}") for season in node.seasons],
+                back="home",
+            ))
+            for season in node.seasons:
+                self.refresh_season(menu, age, season)
+
+    def refresh_season(self, menu, age, season):
+        topics = menu.season(age, season).topics
+        self._topics[(age, season)] = freeze(make_inline_keyboard(
+            [(title, f"t:{topic.id}") for title, topic in topics.items()],
+            back=f"a:{self.index.age_id(age)}",
+        ))
+
+    def seasons(self, age) -> str:
+        return self._seasons[age]
+
+    def topics(self, age, season) -> str:
+        return self._topics[(age, season)]
+
+    def topic_done(self, age, season, topic_id) -> str:
+        """Клавіатура під «Готово ✅»; ID теми стабільний, тож кешується за ним."""
+        kb = self._done.get(topic_id)
+        if kb is None:
+            back = f"s:{self.index.age_id(age)}:{self.index.season_id(age, season)}"
+            kb = self._done[topic_id] = freeze(
+                make_inline_keyboard([("📩 Текст для батьків", f"p:{topic_id}")], back=back)
+            )
+        return kb
@@ -0,0 +1,226 @@
+"""
+Навантажувальний прогін диспетчера без Telegram: синтетичні апдейти через dp
+і фейковий Bot API в процесі (запис викликів, штучна затримка, RetryAfter).
+
+Шляхи батьків /start → вік → сезон → тема → «📩 Текст для батьків» ідуть паралельно
+з різних чатів; між ними адмін редагує повідомлення тем. Звіт: апдейтів/с,
+p50/p99 затримки за кроками, викликів API на шлях.
+
+python loadtest.py [--journeys 500] [--concurrency 50] [--admin-every 20]
+                   [--latency 0.005] [--retry-after-rate 0] [--real-limits] [--seed 1]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from aiogram import Bot, Dispatcher, types
+from aiogram.utils.exceptions import RetryAfter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PARENT_CHAT_BASE = 10_000_000
+UNLIMITED = 1e9  # токенів/с: у прогоні міряємо диспетчер, а не ліміти Telegram
+
+
+class FakeBotAPI:
+    """
+    Підміна bot.request: відповідає мінімальними правдоподібними об'єктами, рахує виклики
+    за методом і за чатом. latency — секунд на виклик; retry_after_rate — частка викликів,
+    на які «Telegram» відповідає RetryAfter(retry_after).
+    """
+
+    def __init__(self, latency: float = 0.0, retry_after_rate: float = 0.0, retry_after: int = 1, seed: int = 0):
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.calls = Counter()        # метод → викликів
+        self.chat_calls = Counter()   # chat_id → викликів
+        self.retry_afters = 0
+        self._ids = itertools.count(1)
+
+    def _message(self, chat_id, **extra):
+        return {"message_id": next(self._ids), "date": 0, "chat": {"id": int(chat_id), "type": "private"}, **extra}
+
+    def _media(self, chat_id, kind):
+        file_id = f"F{next(self._ids)}"
+        if kind == "photo":
+            return self._message(chat_id, photo=[{"file_id": file_id, "file_unique_id": file_id, "width": 1, "height": 1}])
+        return self._message(chat_id, document={"file_id": file_id, "file_unique_id": file_id})
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        data = data or {}
+        chat_id = data.get("chat_id")
+        self.calls[method] += 1
+        if chat_id is not None:
+            self.chat_calls[int(chat_id)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.retry_after_rate and self.random.random() < self.retry_after_rate:
+            self.retry_afters += 1
+            raise RetryAfter(self.retry_after)
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(chat_id, text=data.get("text", ""))
+        if method in ("sendPhoto", "sendDocument"):
+            return self._media(chat_id, "photo" if method == "sendPhoto" else "document")
+        if method == "sendMediaGroup":
+            return [self._media(chat_id, item["type"]) for item in json.loads(data["media"])]
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "loadtest", "username": "loadtest_bot"}
+        return True
+
+
+def load_bot(workdir: str):
+    """
+    Імпортувати bot.py в окремій теці з копією меню: FSM-база, підписки й записи меню — тимчасові.
+    Змінює поточну теку — повертає її той, хто викликає (див. main).
+    """
+    shutil.copy(os.path.join(HERE, "menu_data.json"), workdir)
+    os.chdir(workdir)
+    os.environ.setdefault("BOT_TOKEN", "123456:loadtest")
+    # бази — лише в workdir, навіть якщо оточення (render.yaml) вказує на справжні
+    os.environ["FSM_DB"] = os.path.join(workdir, "fsm.sqlite3")
+    os.environ["BROADCAST_DB"] = os.path.join(workdir, "broadcast.sqlite3")
+    os.environ["CONTENT_BACKEND"] = "json"
+    os.environ["CONTENT_DB"] = os.path.join(workdir, "content.sqlite3")
+    os.environ["BOT_ROLE"] = "single"
+    os.environ["MENU_WATCH_INTERVAL"] = "0"
+    sys.path.insert(0, HERE)
+    import bot
+    return bot
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class LoadTest:
+    def __init__(self, bot, api: FakeBotAPI, seed: int = 1):
+        self.bot = bot
+        self.api = api
+        self.random = random.Random(seed)
+        self.latencies = defaultdict(list)  # крок → [секунд]
+        self.updates = 0
+        self._ids = itertools.count(1)
+        self.topics = [(age, season, title, topic) for age, season, title, topic in bot.menu.walk()]
+        self.editable = [node for node in self.topics if node[3].messages]
+
+    def _update(self, chat_id, text):
+        message = {
+            "message_id": next(self._ids), "date": 0, "text": text,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "load"},
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return types.Update(update_id=next(self._ids), message=message)
+
+    async def _send(self, step, chat_id, text):
+        dp = self.bot.dp
+        started = time.perf_counter()
+        # як у polling: кожен апдейт — окрема задача
+        await asyncio.get_running_loop().create_task(dp.updates_handler.notify(self._update(chat_id, text)))
+        self.latencies[step].append(time.perf_counter() - started)
+        self.updates += 1
+
+    async def parent_journey(self, chat_id):
+        age, season, title, _ = self.random.choice(self.topics)
+        for step, text in (("start", "/start"), ("age", age), ("season", season),
+                           ("topic", title), ("parents_text", "📩 Текст для батьків")):
+            await self._send(step, chat_id, text)
+
+    async def admin_journey(self):
+        age, season, title, topic = self.random.choice(self.editable)
+        admin = self.bot.ADMIN_ID
+        for step, text in (("admin_entry", "🧩 Повідомлення теми (додати/редагувати/видалити)"),
+                           ("admin_age", age), ("admin_season", season), ("admin_topic", title),
+                           ("admin_mode", "✏️ Редагувати повідомлення"), ("admin_pick", "1"),
+                           ("admin_save", topic.messages[0])):
+            await self._send(step, admin, text)
+
+    async def run(self, journeys: int, concurrency: int, admin_every: int) -> dict:
+        Bot.set_current(self.bot.bot)
+        Dispatcher.set_current(self.bot.dp)
+        pending = iter(range(journeys))
+
+        async def parents():
+            for index in pending:
+                await self.parent_journey(PARENT_CHAT_BASE + index)
+
+        async def admin():
+            for _ in range(journeys // admin_every if admin_every else 0):
+                await self.admin_journey()
+
+        started = time.perf_counter()
+        await asyncio.gather(admin(), *(parents() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        await self.bot.sender.close()
+        await self.bot.content_store.close()
+
+        parent_calls = [self.api.chat_calls[PARENT_CHAT_BASE + index] for index in range(journeys)]
+        admin_journeys = journeys // admin_every if admin_every else 0
+        every = [value for values in self.latencies.values() for value in values]
+        return {
+            "updates": self.updates,
+            "seconds": elapsed,
+            "updates_per_sec": self.updates / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(every, 0.50) * 1000,
+            "p99_ms": percentile(every, 0.99) * 1000,
+            "steps": {
+                step: (len(values), percentile(values, 0.50) * 1000, percentile(values, 0.99) * 1000)
+                for step, values in self.latencies.items()
+            },
+            "calls_per_parent_journey": sum(parent_calls) / journeys if journeys else 0.0,
+            "calls_per_admin_journey": self.api.chat_calls[self.bot.ADMIN_ID] / admin_journeys if admin_journeys else 0.0,
+            "calls": dict(self.api.calls),
+            "retry_afters": self.api.retry_afters,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--journeys", type=int, default=500, help="шляхів батьків")
+    parser.add_argument("--concurrency", type=int, default=50, help="одночасних чатів")
+    parser.add_argument("--admin-every", type=int, default=20, help="одна адмін-правка на N шляхів (0 — без правок)")
+    parser.add_argument("--latency", type=float, default=0.005, help="секунд на виклик фейкового API")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="частка викликів з RetryAfter")
+    parser.add_argument("--retry-after", type=int, default=1, help="секунд у RetryAfter")
+    parser.add_argument("--real-limits", action="store_true", help="лишити ліміти відправки Telegram (30/с на бота)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        try:
+            bot = load_bot(workdir)
+            api = FakeBotAPI(args.latency, args.retry_after_rate, args.retry_after, seed=args.seed)
+            bot.bot.request = api.request
+            bot.metrics.instrument_bot(bot.bot)
+            if not args.real_limits:
+                bot.sender = bot.SendScheduler(bot.bot, UNLIMITED, UNLIMITED, UNLIMITED)
+                bot.metrics.instrument_sender(bot.sender)
+            result = asyncio.run(
+                LoadTest(bot, api, seed=args.seed).run(args.journeys, args.concurrency, args.admin_every)
+            )
+        finally:
+            os.chdir(cwd)  # load_bot перейшов у тимчасову теку
+
+    print(f"Апдейтів: {result['updates']} за {result['seconds']:.2f} с — {result['updates_per_sec']:.0f}/с")
+    print(f"Затримка: p50 {result['p50_ms']:.1f} мс, p99 {result['p99_ms']:.1f} мс")
+    for step, (count, p50, p99) in result["steps"].items():
+        print(f"  {step:<14} {count:>6}  p50 {p50:7.1f} мс  p99 {p99:7.1f} мс")
+    print(f"Викликів API: на шлях батьків {result['calls_per_parent_journey']:.1f}, "
+          f"на адмін-правку {result['calls_per_admin_journey']:.1f}, RetryAfter {result['retry_afters']}")
+    print("  " + ", ".join(f"{method} {count}" for method, count in sorted(result["calls"].items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Модель меню в пам'яті: вік → сезон → тема на __slots__, з інтернованими назвами
+і плоским індексом (вік, сезон, тема) → Topic. У файл і з файлу — той самий JSON-формат.
+
+python menu_model.py [menu_data.json]  — пам'ять і швидкість пошуку: вкладені dict проти моделі
+"""
+import sys
+import time
+import tracemalloc
+
+from persistence import snapshot_tree
+
+TOPIC_FIELDS = ("id", "messages", "media", "links")
+
+
+class Topic:
+    """
+    Тема: повідомлення, медіа (dict-елементи, див. topic_media.py) і посилання.
+    Усі три — кортежі: порожній спільний, без запасу ємності, як у list; змінюються заміною.
+    """
+
+    __slots__ = ("id", "messages", "media", "links", "extra")
+
+    def __init__(self, messages=(), media=(), links=(), id=None, extra=None):
+        self.id = id
+        self.messages = tuple(messages)
+        self.media = tuple(media)
+        self.links = tuple(links)
+        self.extra = extra  # невідомі моделі поля з JSON — зберігаються як є
+
+    @classmethod
+    def from_dict(cls, obj: dict) -> "Topic":
+        extra = {key: value for key, value in obj.items() if key not in TOPIC_FIELDS}
+        return cls(obj.get("messages") or (), obj.get("media") or (), obj.get("links") or (),
+                   obj.get("id"), extra or None)
+
+    def to_dict(self) -> dict:
+        """Знімок у JSON-формі: нові списки й dict, рядки спільні."""
+        obj = dict(self.extra) if self.extra else {}
+        if self.id is not None:
+            obj["id"] = self.id
+        obj["messages"] = list(self.messages)
+        obj["media"] = [snapshot_tree(item) for item in self.media]
+        obj["links"] = [snapshot_tree(link) for link in self.links]
+        return obj
+
+
+class Season:
+    __slots__ = ("title", "topics")
+
+    def __init__(self, title: str):
+        self.title = sys.intern(title)
+        self.topics = {}  # назва → Topic, у порядку меню
+
+
+class Age:
+    __slots__ = ("title", "seasons")
+
+    def __init__(self, title: str):
+        self.title = sys.intern(title)
+        self.seasons = {}  # назва → Season
+
+
+class Menu:
+    """
+    Дерево для порядку (клавіатури, обхід) і плоский індекс для гарячого шляху:
+    menu.topic(age, season, topic) — одне звертання до dict замість ланцюжка .get().
+    Структурні зміни — лише через add_topic / remove_topic / rename_topic, щоб індекс не розійшовся.
+    """
+
+    __slots__ = ("ages", "_index")
+
+    def __init__(self):
+        self.ages = {}    # назва → Age
+        self._index = {}  # (age, season, topic) → Topic
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Menu":
+        menu = cls()
+        for age_title, seasons in data.items():
+            age = menu.ages[sys.intern(age_title)] = Age(age_title)
+            for season_title, topics in seasons.items():
+                season = age.seasons[sys.intern(season_title)] = Season(season_title)
+                for title, topic_obj in topics.items():
+                    title = sys.intern(title)
+                    topic = season.topics[title] = Topic.from_dict(topic_obj)
+                    menu._index[(age.title, season.title, title)] = topic
+        return menu
+
+    def to_dict(self) -> dict:
+        return {
+            age_title: {
+                season_title: {title: topic.to_dict() for title, topic in season.topics.items()}
+                for season_title, season in age.seasons.items()
+            }
+            for age_title, age in self.ages.items()
+        }
+
+    # --- пошук ---
+
+    def topic(self, age, season, title):
+        return self._index.get((age, season, title))
+
+    def season(self, age, season):
+        node = self.ages.get(age)
+        return node.seasons.get(season) if node is not None else None
+
+    def walk(self):
+        """(age, season, title, Topic) для всіх тем у порядку меню."""
+        for age_title, age in self.ages.items():
+            for season_title, season in age.seasons.items():
+                for title, topic in season.topics.items():
+                    yield age_title, season_title, title, topic
+
+    def __len__(self):
+        return len(self._index)
+
+    # --- зміни структури ---
+
+    def add_topic(self, age, season, title, topic: Topic) -> Topic:
+        """Додати тему в кінець сезону (або замінити тему з такою назвою на місці)."""
+        title = sys.intern(title)
+        node = self.season(age, season)
+        node.topics[title] = topic
+        self._index[(age, season, title)] = topic
+        return topic
+
+    def remove_topic(self, age, season, title):
+        topic = self._index.pop((age, season, title), None)
+        if topic is not None:
+            del self.season(age, season).topics[title]
+        return topic
+
+    def rename_topic(self, age, season, old_title, new_title):
+        """Перейменувати тему на її місці в сезоні; тема з новою назвою, якщо була, замінюється."""
+        topic = self.topic(age, season, old_title)
+        if topic is None or new_title == old_title:
+            return topic
+        new_title = sys.intern(new_title)
+        self.remove_topic(age, season, new_title)
+        node = self.season(age, season)
+        node.topics = {new_title if title == old_title else title: value
+                       for title, value in node.topics.items()}
+        del self._index[(age, season, old_title)]
+        self._index[(age, season, new_title)] = topic
+        return topic
+
+
+# === Порівняння з вкладеними dict ===
+
+def _measure(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def _lookup_ns(lookup, keys, repeat):
+    started = time.perf_counter_ns()
+    for _ in range(repeat):
+        for key in keys:
+            lookup(*key)
+    return (time.perf_counter_ns() - started) / (repeat * len(keys))
+
+
+def compare(path: str, repeat: int = 200):
+    import json
+    from content_store import upgrade_menu
+
+    with open(path, encoding="utf-8") as f:
+        raw = upgrade_menu(json.load(f))[0]
+    # рядки (тексти, назви) розібрані заздалегідь і спільні — міряється лише структура
+    tree, tree_bytes = _measure(lambda: snapshot_tree(raw))
+    menu, menu_bytes = _measure(lambda: Menu.from_dict(snapshot_tree(raw)))
+    keys = [(age, season, title) for age, season, title, _ in menu.walk()]
+    keys += [(age, season, "немає такої теми") for age, season, _ in keys[:20]]
+    dict_ns = _lookup_ns(lambda a, s, t: tree.get(a, {}).get(s, {}).get(t), keys, repeat)
+    menu_ns = _lookup_ns(menu.topic, keys, repeat)
+    return {
+        "topics": len(menu),
+        "dict_bytes": tree_bytes,
+        "menu_bytes": menu_bytes,
+        "dict_lookup_ns": dict_ns,
+        "menu_lookup_ns": menu_ns,
+    }
+
+
+if __name__ == "__main__":
+    result = compare(sys.argv[1] if len(sys.argv) > 1 else "menu_data.json")
+    print(f"Тем: {result['topics']}")
+    print(f"Пам'ять: dict {result['dict_bytes'] / 1024:.0f} КБ → модель {result['menu_bytes'] / 1024:.0f} КБ")
+    print(f"Пошук теми: .get().get().get() {result['dict_lookup_ns']:.0f} нс → "
+          f"menu.topic() {result['menu_lookup_ns']:.0f} нс")
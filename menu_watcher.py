@@ -0,0 +1,71 @@
+"""Гаряче перезавантаження меню: стеження за файлом чи версією контенту без рестарту воркера."""
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class MenuWatcher:
+    """
+    Раз на interval секунд порівнює signature() з відомою: для JSON — (mtime_ns, розмір) файлу,
+    для SQLite — лічильник версії контенту, який збільшує кожен запис будь-якого процесу.
+    Нова версія читається й готується в окремому потоці (read → результат),
+    а застосовується одним синхронним викликом apply(результат) в event loop,
+    тож хендлери бачать або старе дерево, або нове, але не напівзібране.
+
+    own_signature() — сигнатура нашого власного останнього запису (її не перечитуємо);
+    busy() — True, поки є незаписані правки з адмінки: тоді чекаємо, бо їхній запис
+    однаково перезапише файл (виграє останній записувач).
+    """
+
+    def __init__(self, signature, read, apply, interval: float = 2.0,
+                 own_signature=lambda: None, busy=lambda: False, name: str = "menu"):
+        self.signature = signature
+        self.read = read
+        self.apply = apply
+        self.interval = interval
+        self.own_signature = own_signature
+        self.busy = busy
+        self.name = name
+        self.known = signature()
+        self.reloads = 0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            signature = self.signature()
+            if signature is None or signature == self.known:
+                continue
+            if signature == self.own_signature():
+                self.known = signature
+                continue
+            if self.busy():
+                continue
+            try:
+                result = await loop.run_in_executor(None, self.read)
+            except Exception:
+                # напівзаписаний чи зіпсований файл — лишаємо старе меню, спробуємо на наступній зміні
+                log.exception("Не вдалося перечитати %s", self.name)
+                self.known = signature
+                continue
+            if self.busy() or self.signature() != signature:
+                continue  # поки читали, файл знову змінився або з'явились правки — наступного разу
+            self.apply(result)
+            self.known = signature
+            self.reloads += 1
+            log.info("Меню перезавантажено з %s", self.name)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,275 @@
+"""
+Метрики воркера: затримки хендлерів, апдейти за станом FSM, виклики Bot API,
+операції FSM-сховища й збереження меню. Віддаються у форматі Prometheus
+(GET /metrics на METRICS_PORT) і раз на інтервал — одним JSON-рядком у лог.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# назва → (тип, опис, межі гістограми)
+METRICS = {
+    "bot_updates_total": ("counter", "Апдейти за станом FSM на момент надходження", None),
+    "bot_handler_seconds": ("histogram", "Тривалість обробки апдейту за хендлером", TIME_BUCKETS),
+    "bot_api_calls_per_update": ("histogram", "Викликів Bot API, спричинених одним апдейтом", COUNT_BUCKETS),
+    "bot_api_call_seconds": ("histogram", "Тривалість викликів Bot API за методом", TIME_BUCKETS),
+    "bot_api_errors_total": ("counter", "Невдалі виклики Bot API за методом", None),
+    "bot_fsm_storage_seconds": ("histogram", "Операції FSM-сховища", TIME_BUCKETS),
+    "bot_content_store_seconds": ("histogram", "Збереження меню: save_menu (save_all) і точкові правки", TIME_BUCKETS),
+    "bot_menu_write_seconds": ("histogram", "Запис menu_data.json на диск (у потоці)", TIME_BUCKETS),
+}
+
+# апдейт, що зараз обробляється в цій задачі (див. MetricsMiddleware)
+_current = ContextVar("metrics_update", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # останній — +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class _UpdateRecord:
+    __slots__ = ("started", "handler", "calls")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.handler = "unhandled"
+        self.calls = 0
+
+
+class Metrics:
+    """
+    Реєстр лічильників і гістограм з мітками. observe/inc можна викликати і з потоків
+    (запис меню йде в executor), тож зміни — під замком.
+    """
+
+    def __init__(self):
+        self._histograms = {}  # (назва, мітки) → Histogram
+        self._counters = {}    # (назва, мітки) → число
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    # --- інструментування чужих об'єктів ---
+
+    def wrap(self, func, name, **labels):
+        """Обгортка, що міряє тривалість виклику func (звичайної чи async) у гістограму name."""
+        if asyncio.iscoroutinefunction(func):
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+        else:
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+        timed.__name__ = getattr(func, "__name__", name)
+        return timed
+
+    def instrument(self, obj, methods, name):
+        """Підмінити методи екземпляра obj обгортками з міткою op=<назва методу>."""
+        for method in methods:
+            setattr(obj, method, self.wrap(getattr(obj, method), name, op=method))
+
+    def instrument_bot(self, bot):
+        """Усі виклики Bot API йдуть через bot.request: тривалість і помилки за методом."""
+        request = bot.request
+
+        async def timed_request(method, data=None, files=None, **kwargs):
+            record = _current.get()
+            if record is not None:
+                record.calls += 1
+            started = time.perf_counter()
+            try:
+                return await request(method, data, files, **kwargs)
+            except Exception:
+                self.inc("bot_api_errors_total", method=method)
+                raise
+            finally:
+                self.observe("bot_api_call_seconds", time.perf_counter() - started, method=method)
+
+        bot.request = timed_request
+
+    def instrument_sender(self, sender):
+        """
+        Виклики через SendScheduler виконує воркер чату поза контекстом апдейту,
+        тож апдейту їх зараховуємо в момент постановки в чергу.
+        """
+        submit = sender.submit
+
+        def counted_submit(chat_id, method, **kwargs):
+            record = _current.get()
+            if record is not None:
+                record.calls += 1
+            return submit(chat_id, method, **kwargs)
+
+        sender.submit = counted_submit
+
+    # --- вивід ---
+
+    def render(self) -> str:
+        """Текстовий формат експозиції Prometheus."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            histograms = [(key, list(h.counts), h.sum, h.count, h.buckets) for key, h in histograms]
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described:
+                described.add(name)
+                kind, help_text, _ = METRICS[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), counts, total, count, buckets in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels((*labels, ('le', bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Стисло для логу: лічильники й {count, avg, max} кожної гістограми (мс, для кількостей — штуки)."""
+        with self._lock:
+            result = {}
+            for (name, labels), value in self._counters.items():
+                result.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "-"] = value
+            for (name, labels), h in self._histograms.items():
+                scale = 1 if METRICS[name][2] is COUNT_BUCKETS else 1000
+                result.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "-"] = {
+                    "count": h.count,
+                    "avg": round(h.sum / h.count * scale, 2) if h.count else 0,
+                    "max": round(h.max * scale, 2),
+                }
+        return result
+
+    # --- HTTP і лог ---
+
+    async def start_server(self, host: str, port: int) -> web.AppRunner:
+        async def handle(request):
+            return web.Response(body=self.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    async def log_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            log.info("metrics %s", json.dumps(self.summary(), ensure_ascii=False, sort_keys=True))
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Час від надходження апдейту до кінця обробки, з міткою хендлера.
+    Для маршрутизатора й inline-колбеків справжній хендлер кладеться в data["route"]
+    (див. routing.Router.dispatch і bot.nav_callback), інакше — той, що зареєстровано в aiogram.
+    """
+
+    def __init__(self, metrics: Metrics, storage):
+        super().__init__()
+        self.metrics = metrics
+        self.storage = storage
+
+    async def on_pre_process_update(self, update, data):
+        data["metrics_token"] = _current.set(_UpdateRecord())
+
+    async def on_post_process_update(self, update, results, data):
+        record = _current.get()
+        if record is None:
+            return
+        self.metrics.observe("bot_handler_seconds", time.perf_counter() - record.started, handler=record.handler)
+        self.metrics.observe("bot_api_calls_per_update", record.calls, handler=record.handler)
+        _current.reset(data["metrics_token"])
+
+    async def _count_state(self, chat, user):
+        state = await self.storage.get_state(chat=chat, user=user)
+        self.metrics.inc("bot_updates_total", state=state or "none")
+
+    async def on_pre_process_message(self, message, data):
+        await self._count_state(message.chat.id, message.from_user.id if message.from_user else None)
+
+    async def on_pre_process_callback_query(self, query, data):
+        chat = query.message.chat.id if query.message else None
+        await self._count_state(chat, query.from_user.id)
+
+    def _handled(self, data):
+        record = _current.get()
+        if record is not None:
+            handler = current_handler.get(None)
+            record.handler = data.get("route") or getattr(handler, "__name__", "unknown")
+
+    async def on_process_message(self, message, data):
+        self._handled(data)
+
+    async def on_post_process_message(self, message, results, data):
+        if "route" in data:
+            self._handled(data)
+
+    async def on_process_callback_query(self, query, data):
+        self._handled(data)
+
+    async def on_post_process_callback_query(self, query, results, data):
+        if "route" in data:
+            self._handled(data)
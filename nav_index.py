@@ -0,0 +1,79 @@
+"""Компактні стабільні ID вузлів меню (вік / сезон / тема) для callback_data."""
+import hashlib
+
+
+def _short_hash(name: str, taken, size: int = 4) -> str:
+    """Короткий детермінований ID за назвою; подовжується при колізії."""
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+    for size in range(size, len(digest) + 1):
+        if digest[:size] not in taken:
+            return digest[:size]
+    raise ValueError(f"Не вдалося підібрати ID для {name!r}")
+
+
+class NodeIndex:
+    """
+    Віки й сезони адмінка не перейменовує, тож їхні ID — короткий хеш назви.
+    Темам ID видається один раз (хеш шляху вік/сезон/назва на момент видачі)
+    і зберігається в самій темі (Topic.id), тому переживає перейменування й рестарти.
+    """
+
+    def __init__(self):
+        self._ages = {}      # age_id → age
+        self._age_ids = {}   # age → age_id
+        self._seasons = {}   # (age_id, season_id) → season
+        self._season_ids = {}  # (age, season) → season_id
+        self._topics = {}    # topic_id → (age, season, topic)
+
+    def rebuild(self, menu) -> list:
+        """Переіндексувати все меню. Повертає [(age, season, title, id)] тем з новими ID (їх треба зберегти)."""
+        self._ages, self._age_ids, self._seasons, self._season_ids = {}, {}, {}, {}
+        self._topics = {}
+        assigned = []
+        for age, age_node in menu.ages.items():
+            aid = _short_hash(age, self._ages)
+            self._ages[aid], self._age_ids[age] = age, aid
+            taken = set()
+            for season, season_node in age_node.seasons.items():
+                sid = _short_hash(season, taken)
+                taken.add(sid)
+                self._seasons[(aid, sid)], self._season_ids[(age, season)] = season, sid
+                for title, topic in season_node.topics.items():
+                    if self.add_topic(age, season, title, topic):
+                        assigned.append((age, season, title, topic.id))
+        return assigned
+
+    def add_topic(self, age, season, title, topic) -> bool:
+        """Зареєструвати тему (нову чи перейменовану). True — якщо видано новий ID."""
+        tid = topic.id
+        assigned = False
+        if not tid or self._topics.get(tid, (age, season, title)) != (age, season, title):
+            tid = _short_hash(f"{age}/{season}/{title}", self._topics, size=6)
+            topic.id = tid
+            assigned = True
+        self._topics[tid] = (age, season, title)
+        return assigned
+
+    def forget_topic(self, age, season, topic):
+        """Прибрати тему з індексу (видалення або стара назва при перейменуванні)."""
+        key = (age, season, topic)
+        for tid in [tid for tid, value in self._topics.items() if value == key]:
+            del self._topics[tid]
+
+    # --- прямий і зворотний пошук ---
+
+    def age_id(self, age):
+        return self._age_ids[age]
+
+    def season_id(self, age, season):
+        return self._season_ids[(age, season)]
+
+    def resolve_age(self, aid):
+        return self._ages.get(aid)
+
+    def resolve_season(self, aid, sid):
+        age, season = self._ages.get(aid), self._seasons.get((aid, sid))
+        return (age, season) if age is not None and season is not None else None
+
+    def resolve_topic(self, tid):
+        return self._topics.get(tid)
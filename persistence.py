@@ -0,0 +1,122 @@
+"""Відкладене (write-behind) збереження меню у JSON поза event loop."""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+def snapshot_tree(obj):
+    """Структурна копія dict/list-дерева (рядки спільні) — дешевий знімок для запису."""
+    if isinstance(obj, dict):
+        return {k: snapshot_tree(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [snapshot_tree(v) for v in obj]
+    return obj
+
+
+def file_signature(path: str):
+    """(mtime_ns, розмір) файлу або None, якщо файлу немає."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def write_json_atomic(path: str, data):
+    """Запис у тимчасовий файл поруч і атомарна заміна — обрив запису не псує оригінал."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MenuPersister:
+    """
+    Збирає серію змін меню в один запис:
+    schedule() лише позначає дані «брудними», а фоновий таск через `delay` секунд
+    знімає знімок дерева в event loop і пише його в окремому потоці.
+    snapshot(data) → JSON-сумісна копія; за замовчуванням — snapshot_tree для dict/list-дерева.
+    on_write(секунди) — після кожного вдалого запису (метрики); викликається й з потоку запису.
+    """
+
+    def __init__(self, path: str, delay: float = 1.0, snapshot=snapshot_tree, on_write=None):
+        self.path = path
+        self.delay = delay
+        self.snapshot = snapshot
+        self.on_write = on_write
+        self.requests = 0
+        self.writes = 0
+        self.signature = None  # file_signature після нашого останнього запису
+        self._data = None
+        self._dirty = False
+        self._task = None
+        self._wake = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="menu-save")
+
+    def schedule(self, data):
+        self._data = data
+        self._dirty = True
+        self.requests += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # поза event loop (скрипти, старт) — пишемо одразу
+            self._write(self.snapshot(data))
+            self._dirty = False
+            return
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.delay)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty = False
+            snapshot = self.snapshot(self._data)
+            try:
+                await loop.run_in_executor(self._executor, self._write, snapshot)
+            except Exception:
+                # зміни лишаються «брудними» й пишуться знову через delay; під час flush() — ним самим
+                log.exception("Не вдалося зберегти %s", self.path)
+                self._dirty = True
+                if self._wake.is_set():
+                    return
+
+    def _write(self, snapshot):
+        started = time.perf_counter()
+        write_json_atomic(self.path, snapshot)
+        self.signature = file_signature(self.path)
+        self.writes += 1
+        if self.on_write is not None:
+            self.on_write(time.perf_counter() - started)
+
+    @property
+    def pending(self) -> bool:
+        """Є зміни, ще не записані у файл."""
+        return self._dirty or (self._task is not None and not self._task.done())
+
+    async def flush(self):
+        """Дописати все відкладене негайно (для зупинки бота)."""
+        if self._task is not None and not self._task.done():
+            self._wake.set()
+            await self._task
+        if self._dirty:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._write, self.snapshot(self._data)
+            )
+            self._dirty = False
+
+    async def close(self):
+        await self.flush()
+        self._executor.shutdown(wait=True)
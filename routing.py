@@ -0,0 +1,86 @@
+"""Маршрутизація текстових повідомлень через словник (стан FSM, текст кнопки) → хендлер."""
+from aiogram import types
+from aiogram.dispatcher import FSMContext
+from aiogram.dispatcher.handler import ctx_data
+from aiogram.dispatcher.filters.state import State, StatesGroup
+
+ANY_STATE = "*"
+
+
+def state_names(state):
+    """State / StatesGroup / рядок / None → кортеж назв станів, як їх зберігає storage."""
+    if isinstance(state, State):
+        return (state.state,)
+    if isinstance(state, type) and issubclass(state, StatesGroup):
+        return tuple(state.all_states_names)
+    return (state,)
+
+
+def normalize(text) -> str:
+    return (text or "").strip()
+
+
+def note_route(handler):
+    """Справжній хендлер апдейту — для middleware (метрики), що бачать лише dispatch."""
+    data = ctx_data.get(None)
+    if data is not None:
+        data["route"] = handler.__name__
+
+
+class Router:
+    """
+    Замість ланцюжка lambda-фільтрів, які aiogram перевіряє по черзі для кожного апдейту,
+    хендлер шукається двома-трьома звертаннями до словників:
+      1) кнопка саме для поточного стану;
+      2) кнопка, доступна з будь-якого стану (state="*");
+      3) хендлер вільного тексту для поточного стану.
+    """
+
+    def __init__(self):
+        self._buttons = {}    # (назва стану, текст) → хендлер
+        self._fallbacks = {}  # назва стану → хендлер вільного тексту
+
+    def button(self, *texts, state=ANY_STATE):
+        """Декоратор: кнопка(и) з фіксованим текстом у заданому стані (або групі станів)."""
+        def decorator(handler):
+            for name in state_names(state):
+                for text in texts:
+                    self._buttons[(name, normalize(text))] = handler
+            return handler
+        return decorator
+
+    def fallback(self, state):
+        """Декоратор: обробник будь-якого іншого тексту в заданому стані."""
+        def decorator(handler):
+            for name in state_names(state):
+                self._fallbacks[name] = handler
+            return handler
+        return decorator
+
+    def set_choices(self, state, texts, handler):
+        """Замінити динамічний набір кнопок стану (напр. вікові категорії з menu_data)."""
+        names = state_names(state)
+        stale = [key for key, h in self._buttons.items() if key[0] in names and h is handler]
+        for key in stale:
+            del self._buttons[key]
+        for name in names:
+            for text in texts:
+                self._buttons[(name, normalize(text))] = handler
+
+    def resolve(self, state_name, text):
+        text = normalize(text)
+        return (
+            self._buttons.get((state_name, text))
+            or self._buttons.get((ANY_STATE, text))
+            or self._fallbacks.get(state_name)
+        )
+
+    async def dispatch(self, message: types.Message, state: FSMContext):
+        handler = self.resolve(await state.get_state(), message.text)
+        if handler is not None:
+            note_route(handler)
+            return await handler(message, state)
+
+    def register(self, dp, **kwargs):
+        """Підключити маршрутизатор до диспетчера одним хендлером (після команд)."""
+        dp.register_message_handler(self.dispatch, state=ANY_STATE, **kwargs)
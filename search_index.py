@@ -0,0 +1,135 @@
+"""Повнотекстовий пошук по темах: інвертований індекс з українською нормалізацією."""
+import math
+import re
+import sys
+import time
+from collections import Counter, namedtuple
+
+TAG_RE = re.compile(r"<[^>]*>")
+ENTITY_RE = re.compile(r"&#?\w+;")
+APOSTROPHES = str.maketrans("", "", "'’ʼ‘`")  # м'яч, м’яч, мʼяч → мяч
+WORD_RE = re.compile(r"\w+")
+
+# закінчення від довших до коротших; зрізаємо одне, якщо лишається основа ≥ MIN_STEM
+SUFFIXES = tuple(sorted({
+    "ування", "ювання", "ення", "ання", "іння", "ість", "ості", "остю",
+    "ами", "ями", "ові", "еві", "ого", "ому", "ими", "іми", "ях", "ах",
+    "ий", "ій", "ої", "ою", "ею", "ом", "ем", "их", "іх", "ам", "ям", "ів", "ей",
+    "ти", "ть", "ла", "ли", "ло", "ує", "ють", "ують", "ать", "ять",
+    "а", "я", "о", "е", "і", "и", "у", "ю", "ь", "й",
+}, key=len, reverse=True))
+REFLEXIVE = ("ся", "сь")
+MIN_STEM = 3
+
+STOP_WORDS = frozenset({
+    "і", "й", "та", "а", "або", "з", "із", "зі", "в", "у", "на", "до", "по", "за", "від",
+    "для", "що", "як", "це", "не", "ні", "чи", "же", "ж", "б", "би",
+})
+
+TITLE_WEIGHT = 3  # слово в назві теми важить як три входження в тексті
+
+SearchHit = namedtuple("SearchHit", ["age", "season", "topic", "score"])
+
+
+def stem(word: str) -> str:
+    for ending in REFLEXIVE:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            word = word[:-len(ending)]
+            break
+    for ending in SUFFIXES:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text: str):
+    """HTML → слова: без тегів і сутностей, casefold, апостроф усіх видів прибрано, основи."""
+    text = ENTITY_RE.sub(" ", TAG_RE.sub(" ", text or ""))
+    text = text.casefold().translate(APOSTROPHES)
+    return [stem(word) for word in WORD_RE.findall(text)
+            if word not in STOP_WORDS and not word.isdigit()]
+
+
+class SearchIndex:
+    """
+    term → {(age, season, topic): вага}. Будується один раз на старті,
+    далі оновлюється потемно з адмінки (refresh/remove) без перебудови всього індексу.
+    Ранжування — tf-idf; теми, де знайдено більше слів запиту, завжди вище.
+    """
+
+    def __init__(self):
+        self._postings = {}  # term → {doc: tf}
+        self._docs = {}      # doc → Counter(term → tf), щоб знати, що прибрати
+
+    def build(self, menu):
+        self._postings, self._docs = {}, {}
+        for age, season, title, topic in menu.walk():
+            self.refresh(age, season, title, topic)
+
+    def refresh(self, age, season, topic, topic_obj):
+        """Переіндексувати одну тему (або прибрати, якщо її більше немає)."""
+        doc = (age, season, topic)
+        self.remove(*doc)
+        if topic_obj is None:
+            return
+        terms = Counter()
+        for term in tokenize(topic):
+            terms[term] += TITLE_WEIGHT
+        for msg in topic_obj.messages:
+            terms.update(tokenize(msg))
+        self._docs[doc] = terms
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc] = tf
+
+    def remove(self, age, season, topic):
+        doc = (age, season, topic)
+        for term in self._docs.pop(doc, ()):
+            postings = self._postings[term]
+            del postings[doc]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, limit: int = 10):
+        terms = set(tokenize(query))
+        scores = {}
+        total = len(self._docs) or 1
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for doc, tf in postings.items():
+                matched, score = scores.get(doc, (0, 0.0))
+                scores[doc] = (matched + 1, score + (1 + math.log(tf)) * idf)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [SearchHit(*doc, round(score, 3)) for doc, (_, score) in ranked]
+
+    def stats(self) -> dict:
+        return {"topics": len(self._docs), "terms": len(self._postings)}
+
+
+def benchmark(menu, queries, repeat: int = 2000):
+    started = time.perf_counter()
+    index = SearchIndex()
+    index.build(menu)
+    build_ms = (time.perf_counter() - started) * 1000
+    rows = []
+    for query in queries:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            hits = index.search(query)
+        rows.append((query, (time.perf_counter() - started) / repeat * 1e6, hits))
+    return index, build_ms, rows
+
+
+if __name__ == "__main__":
+    from content_store import read_menu_file
+
+    # python search_index.py [menu_data.json] [запит ...]
+    path = sys.argv[1] if len(sys.argv) > 1 else "menu_data.json"
+    queries = sys.argv[2:] or ["осінь", "листя", "м'яч", "МАМА тато", "ігри з пальчиками", "зима сніг"]
+    index, build_ms, rows = benchmark(read_menu_file(path), queries)
+    print(f"Індекс: {index.stats()['topics']} тем, {index.stats()['terms']} термів, побудова {build_ms:.1f} мс")
+    for query, micros, hits in rows:
+        top = f"{hits[0].topic} ({hits[0].age}, {hits[0].season})" if hits else "—"
+        print(f"{query!r}: {micros:.1f} мкс, {len(hits)} результатів, перший: {top}")
@@ -0,0 +1,176 @@
+"""Планувальник вихідних повідомлень: черга на кожен чат, ліміти Telegram і RetryAfter."""
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+
+from aiogram.utils.exceptions import RetryAfter
+
+log = logging.getLogger(__name__)
+
+# https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this
+GLOBAL_RATE = 30      # повідомлень/с на бота
+CHAT_RATE = 1         # повідомлень/с в один чат у середньому…
+CHAT_BURST = 20       # …з короткими сплесками (тема з десятком шматків іде одразу)
+BULK_SHARE = 2 / 3    # частка ліміту бота для масових відправок (розсилки); решта — живим відповідям
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Взяти токен; повертає, скільки секунд треба почекати (0 — можна одразу)."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        while True:
+            delay = self.take()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    def time_to_full(self) -> float:
+        self._refill()
+        return (self.capacity - self.tokens) / self.rate
+
+
+class SendScheduler:
+    """
+    Кожен чат має власну FIFO-чергу й воркер, тож порядок повідомлень у чаті зберігається,
+    а різні чати обслуговуються паралельно. Перед кожним викликом API береться токен
+    із бакета чату та з глобального бакета бота; на RetryAfter відправка всіх чатів
+    ставиться на паузу на вказаний Telegram час і виклик повторюється.
+
+    Масові виклики (bulk=True) мають нижчий пріоритет: спершу беруть токен з окремого
+    бакета на global_rate * bulk_share без запасу на сплеск, а глобальний токен — лише
+    коли на нього не чекає жодна жива відповідь.
+    """
+
+    def __init__(self, bot, global_rate: float = GLOBAL_RATE,
+                 chat_rate: float = CHAT_RATE, chat_burst: float = CHAT_BURST, bulk_share: float = BULK_SHARE):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_rate)
+        self._bulk = TokenBucket(global_rate * bulk_share, 1)
+        self._urgent = 0  # живих викликів, що чекають на глобальний токен
+        self._queues = {}
+        self._workers = {}
+        self._buckets = {}
+        self._paused_until = 0.0
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    def submit(self, chat_id, method: str, bulk: bool = False, **kwargs) -> asyncio.Future:
+        """Поставити виклик bot.<method>(chat_id=..., **kwargs) у чергу чату; bulk — масова відправка."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+        queue.append((method, kwargs, future, bulk))
+        if chat_id not in self._workers:
+            # воркер переживає апдейт, що його створив, — не успадковуємо контекст цього апдейту
+            self._workers[chat_id] = loop.create_task(self._worker(chat_id), context=contextvars.Context())
+        return future
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self.submit(chat_id, "send_message", text=text, **kwargs)
+
+    async def send_messages(self, chat_id, texts, bulk: bool = False, **last_kwargs):
+        """Надіслати серію текстів підряд; last_kwargs (напр. reply_markup) — лише останньому."""
+        texts = list(texts)
+        futures = [
+            self.submit(chat_id, "send_message", bulk=bulk, text=text,
+                        **(last_kwargs if i == len(texts) - 1 else {}))
+            for i, text in enumerate(texts)
+        ]
+        return await asyncio.gather(*futures)
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def _worker(self, chat_id):
+        queue = self._queues[chat_id]
+        bucket = self._bucket(chat_id)
+        try:
+            while queue:
+                method, kwargs, future, bulk = queue[0]
+                await bucket.acquire()
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                if bulk:
+                    await self._bulk.acquire()
+                    while self._urgent:
+                        await asyncio.sleep(1 / self._global.rate)
+                    await self._global.acquire()
+                else:
+                    self._urgent += 1
+                    try:
+                        await self._global.acquire()
+                    finally:
+                        self._urgent -= 1
+                if future.cancelled():
+                    # той, хто поставив виклик, від нього відмовився (напр. зупинка розсилки) — не шлемо
+                    queue.popleft()
+                    continue
+                try:
+                    result = await getattr(self.bot, method)(chat_id=chat_id, **kwargs)
+                except RetryAfter as e:
+                    self.retries += 1
+                    log.warning("RetryAfter %ss для чату %s", e.timeout, chat_id)
+                    self._paused_until = max(self._paused_until, time.monotonic() + e.timeout)
+                    continue
+                except Exception as e:
+                    queue.popleft()
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                queue.popleft()
+                self.sent += 1
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            del self._queues[chat_id]
+            del self._workers[chat_id]
+            # бакет живе, доки не наповниться знову, — інакше черговий тап обійшов би ліміт
+            asyncio.get_running_loop().call_later(bucket.time_to_full(), self._drop_bucket, chat_id)
+
+    def _drop_bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is not None and chat_id not in self._workers and bucket.time_to_full() < 1e-3:
+            del self._buckets[chat_id]
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "active_chats": len(self._workers),
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+    async def close(self):
+        """Дочекатися відправки всього, що вже в чергах."""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
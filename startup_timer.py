@@ -0,0 +1,19 @@
+"""Звіт про тривалість холодного старту за етапами."""
+import time
+
+
+class StartupTimer:
+    """mark(етап) фіксує час від попередньої позначки; report() — один рядок для логу й /stats."""
+
+    def __init__(self, started: float = None):
+        self.started = self._last = started if started is not None else time.perf_counter()
+        self.stages = {}
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = now - self._last
+        self._last = now
+
+    def report(self) -> str:
+        parts = ", ".join(f"{stage} {seconds * 1000:.0f} мс" for stage, seconds in self.stages.items())
+        return f"{parts}; разом {(self._last - self.started) * 1000:.0f} мс"
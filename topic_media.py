@@ -0,0 +1,76 @@
+"""
+Медіа тем: групування в альбоми, запити до Bot API і кеш file_id.
+
+Елемент topic.media: {"type": "photo" | "document", "file_id": ..., "caption": ...};
+замість file_id можна вказати "url" чи "path" — файл завантажиться один раз,
+а отриманий file_id запишеться в елемент, тож далі байти більше не передаються.
+"""
+from aiogram.types import InputFile, InputMediaDocument, InputMediaPhoto
+
+MAX_ALBUM = 10  # обмеження sendMediaGroup
+
+SEND_ONE = {"photo": "send_photo", "document": "send_document"}
+INPUT_MEDIA = {"photo": InputMediaPhoto, "document": InputMediaDocument}
+
+
+def media_groups(items):
+    """
+    Розбити медіа на відправки: фото з фото, документи з документами (Telegram не змішує їх
+    в одному альбомі), до MAX_ALBUM в групі, порядок зберігається.
+    """
+    groups = []
+    for item in items or ():
+        kind = item.get("type")
+        if kind not in SEND_ONE or not (item.get("file_id") or item.get("url") or item.get("path")):
+            continue
+        last = groups[-1] if groups else None
+        if last and last[0]["type"] == kind and len(last) < MAX_ALBUM:
+            last.append(item)
+        else:
+            groups.append([item])
+    return tuple(tuple(group) for group in groups)
+
+
+def _source(item):
+    if item.get("file_id"):
+        return item["file_id"]
+    if item.get("url"):
+        return item["url"]
+    return InputFile(item["path"])
+
+
+def media_request(group):
+    """Група → (метод бота, kwargs) для SendScheduler.submit."""
+    if len(group) == 1:
+        item = group[0]
+        kind = item["type"]
+        return SEND_ONE[kind], {kind: _source(item), "caption": item.get("caption") or None}
+    media = [
+        INPUT_MEDIA[item["type"]](
+            _source(item),
+            caption=item.get("caption") or None,
+            parse_mode="HTML" if item.get("caption") else None,
+        )
+        for item in group
+    ]
+    return "send_media_group", {"media": media}
+
+
+def _sent_file_id(message, kind):
+    if kind == "photo":
+        return message.photo[-1].file_id if message.photo else None
+    return message.document.file_id if message.document else None
+
+
+def remember_file_ids(group, result) -> bool:
+    """Записати file_id щойно завантажених файлів у їхні елементи. True — якщо щось змінилось."""
+    messages = result if isinstance(result, list) else [result]
+    changed = False
+    for item, message in zip(group, messages):
+        if item.get("file_id"):
+            continue
+        file_id = _sent_file_id(message, item["type"])
+        if file_id:
+            item["file_id"] = file_id
+            changed = True
+    return changed
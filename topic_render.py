@@ -0,0 +1,225 @@
+"""Підготовка тем до відправки: поділ довгих текстів і кеш готових шматків."""
+import html
+import re
+import sys
+from collections import namedtuple
+
+from topic_media import media_groups
+
+MAX_TG = 4000  # запас до обмеження Telegram 4096 символів
+
+SEPARATORS = ("\n\n", "\n", ". ")
+
+TAG_RE = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*>")
+ENTITY_TAIL_RE = re.compile(r"&#?\w{0,10}")
+
+# chunks — усі повідомлення теми, вже поділені на шматки ≤ MAX_TG;
+# first_chunks — лише перше повідомлення (кнопка «📩 Текст для батьків»);
+# media — групи медіа на відправку (альбоми), див. topic_media.py.
+RenderedTopic = namedtuple("RenderedTopic", ["chunks", "first_chunks", "media"])
+
+EMPTY_TOPIC = RenderedTopic((), (), ())
+
+
+def _best_cut(text: str, start: int, limit: int) -> int:
+    """Найкраща точка розрізу в text[start:limit]: абзац → рядок → речення → жорстко."""
+    for sep in SEPARATORS:
+        cut = text.rfind(sep, start, limit)
+        if cut > start:
+            return cut + 1 if sep == ". " else cut  # крапка лишається в кінці речення
+    return limit
+
+
+def split_text(text: str, max_len: int = MAX_TG):
+    """
+    Розумний поділ довгого тексту на шматки ≤ max_len.
+    Ріже по найкращому роздільнику в межах ліміту (абзац → рядок → речення),
+    рухаючи курсор по вихідному рядку замість копіювання залишку.
+    """
+    text = text or ""
+    chunks = []
+    start, end = 0, len(text)
+    while end - start > max_len:
+        cut = _best_cut(text, start, start + max_len)
+        chunks.append(text[start:cut].rstrip())
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        chunks.append(text[start:])
+    return chunks
+
+
+def _safe_cut(text: str, start: int, cut: int) -> int:
+    """Відсунути розріз назад, якщо він припадає всередину HTML-тегу чи сутності (&amp;)."""
+    lt = text.rfind("<", start, cut)
+    if lt != -1 and text.find(">", lt, cut) == -1:
+        cut = lt
+    amp = text.rfind("&", max(start, cut - 12), cut)
+    if amp != -1 and ENTITY_TAIL_RE.fullmatch(text, amp, cut):
+        cut = amp
+    return cut
+
+
+def _track_tags(stack: list, fragment: str):
+    """Оновити стек відкритих тегів [(назва, повний відкривальний тег)] за фрагментом."""
+    for m in TAG_RE.finditer(fragment):
+        name = m.group(2).lower()
+        if not m.group(1):
+            stack.append((name, m.group(0)))
+            continue
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] == name:
+                del stack[i:]
+                break
+
+
+def split_html(text: str, max_len: int = MAX_TG):
+    """
+    Як split_text, але для parse_mode="HTML": не ріже всередині тегу чи сутності,
+    а незакриті на межі шматка теги закриває в кінці й відкриває знову на початку наступного.
+    """
+    text = text or ""
+    if "<" not in text and "&" not in text:
+        return split_text(text, max_len)
+    chunks, stack = [], []
+    start, end = 0, len(text)
+    while start < end:
+        prefix = "".join(tag for _, tag in stack)
+        budget = max_len - len(prefix) - sum(len(name) + 3 for name, _ in stack)
+        while True:
+            budget = max(budget, 1)
+            if end - start <= budget:
+                cut = end
+            else:
+                cut = _safe_cut(text, start, _best_cut(text, start, start + budget))
+                if cut <= start:
+                    # тег довший за залишок ліміту — беремо його цілим
+                    gt = text.find(">", start)
+                    cut = gt + 1 if gt != -1 else start + budget
+            body = text[start:cut].rstrip()
+            tail = list(stack)
+            _track_tags(tail, body)
+            suffix = "".join(f"</{name}>" for name, _ in reversed(tail))
+            overflow = len(prefix) + len(body) + len(suffix) - max_len
+            if overflow <= 0 or budget == 1:
+                break
+            budget -= overflow
+        chunks.append(prefix + body + suffix)
+        stack = tail
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    return chunks
+
+
+def pack_messages(messages, max_len: int = MAX_TG):
+    """
+    Склеїти повідомлення теми через порожній рядок і поділити на мінімум шматків:
+    дрібні повідомлення їдуть разом, межі розрізу — по абзацах.
+    """
+    return split_html("\n\n".join(msg for msg in messages if msg), max_len)
+
+
+def render_links(links) -> str:
+    """Список посилань теми → HTML-блок; елемент — URL-рядок або {"title": ..., "url": ...}."""
+    lines = []
+    for link in links or ():
+        if isinstance(link, str):
+            url, title = link, link
+        else:
+            url = link.get("url")
+            title = link.get("title") or url
+        if url:
+            lines.append(f'🔗 <a href="{html.escape(url)}">{html.escape(title)}</a>')
+    return "\n".join(lines)
+
+
+def render_topic(topic, packed: bool = False) -> RenderedTopic:
+    """
+    Перетворити тему на готові до відправки шматки.
+    packed=False — кожне повідомлення окремо (зручно пересилати батькам поштучно);
+    packed=True — мінімальна кількість відправок, див. pack_messages.
+    Блок посилань дописується в кінець останнього повідомлення, а не окремою відправкою.
+    """
+    if topic is None:
+        return EMPTY_TOPIC
+    messages = topic.messages
+    media = media_groups(topic.media)
+    links = render_links(topic.links)
+    if not messages and not media and not links:
+        return EMPTY_TOPIC
+    first_chunks = tuple(split_html(messages[0])) if messages else ()
+    if links:
+        messages = [*messages[:-1], f"{messages[-1]}\n\n{links}"] if messages else [links]
+    if packed:
+        chunks = tuple(pack_messages(messages))
+    else:
+        chunks = tuple(chunk for msg in messages for chunk in split_html(msg))
+    return RenderedTopic(chunks, first_chunks, media)
+
+
+class RenderCache:
+    """
+    Кеш відрендерених тем за ключем (age, season, topic).
+    Будується один раз зі всього меню і оновлюється потемно
+    після змін в адмінці — гарячий шлях лише читає готові кортежі.
+    """
+
+    def __init__(self, packed: bool = False):
+        self.packed = packed
+        self._items = {}
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, menu):
+        self._items = {
+            (age, season, title): render_topic(topic, self.packed)
+            for age, season, title, topic in menu.walk()
+        }
+
+    def get(self, age, season, topic, topic_obj) -> RenderedTopic:
+        key = (age, season, topic)
+        rendered = self._items.get(key)
+        if rendered is not None:
+            self.hits += 1
+            return rendered
+        self.misses += 1
+        rendered = render_topic(topic_obj, self.packed)
+        if topic_obj is not None:
+            self._items[key] = rendered
+        return rendered
+
+    def refresh(self, age, season, topic, topic_obj):
+        """Перерендерити одну тему (або прибрати, якщо її більше немає)."""
+        key = (age, season, topic)
+        if topic_obj is None:
+            self._items.pop(key, None)
+        else:
+            self._items[key] = render_topic(topic_obj, self.packed)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+def delivery_report(menu):
+    """Скільки відправок (без фінального «Готово») потрібно на кожну тему в обох режимах."""
+    rows = []
+    for age, season, title, topic in menu.walk():
+        per_message = len(render_topic(topic).chunks)
+        if per_message:
+            rows.append((age, season, title, per_message, len(render_topic(topic, True).chunks)))
+    return rows
+
+
+if __name__ == "__main__":
+    from content_store import read_menu_file
+
+    # python topic_render.py [menu_data.json]
+    path = sys.argv[1] if len(sys.argv) > 1 else "menu_data.json"
+    report = delivery_report(read_menu_file(path))
+    for age, season, topic, before, after in report:
+        print(f"{age} / {season} / {topic}: {before} → {after}")
+    before = sum(row[3] for row in report)
+    after = sum(row[4] for row in report)
+    print(f"Разом: {before} → {after} повідомлень ({len(report)} тем із вмістом)")
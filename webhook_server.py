@@ -0,0 +1,124 @@
+"""
+Режим webhook: aiohttp-сервер, що приймає апдейти від Telegram замість long polling.
+
+Локально без Telegram: POST збереженого JSON апдейту на http://127.0.0.1:8080/webhook
+із заголовком X-Telegram-Bot-Api-Secret-Token, якщо задано секрет.
+"""
+import asyncio
+import hmac
+import logging
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MAX_IN_FLIGHT = 100   # апдейтів, що обробляються одночасно
+SHUTDOWN_TIMEOUT = 30  # секунд на дообробку прийнятих апдейтів при зупинці
+
+
+class WebhookServer:
+    """
+    Кожен апдейт обробляється в окремій задачі (як у polling: контекст стану FSM не змішується),
+    а Telegram отримує 200 одразу. Коли в роботі вже max_in_flight апдейтів, відповідь
+    затримується до звільнення місця — Telegram сам притримує наступні запити.
+    """
+
+    def __init__(self, dp: Dispatcher, path: str = "/webhook", secret: str = None,
+                 max_in_flight: int = MAX_IN_FLIGHT):
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+        self._closing = False
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.rejected += 1
+            return web.Response(status=401)
+        if self._closing:
+            # Telegram повторить апдейт пізніше — вже наступному воркеру
+            return web.Response(status=503)
+        try:
+            update = types.Update(**await request.json())
+        except (ValueError, TypeError):
+            self.rejected += 1
+            return web.Response(status=400)
+        await self._slots.acquire()
+        self.received += 1
+        task = asyncio.get_running_loop().create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return web.Response()
+
+    async def _process(self, update: types.Update):
+        Dispatcher.set_current(self.dp)
+        Bot.set_current(self.dp.bot)
+        try:
+            # як у polling: через updates_handler, щоб спрацювали middleware рівня апдейту
+            await self.dp.updates_handler.notify(update)
+        except Exception:
+            self.failed += 1
+            log.exception("Помилка обробки апдейту %s", update.update_id)
+
+    def _done(self, task):
+        self._tasks.discard(task)
+        self._slots.release()
+
+    async def drain(self, timeout: float = SHUTDOWN_TIMEOUT):
+        """Перестати приймати нові апдейти й дочекатися вже прийнятих."""
+        self._closing = True
+        if self._tasks:
+            done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                log.warning("Зупинка: не дочекались %d апдейтів", len(pending))
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "received": self.received,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+
+
+def run_webhook(dp: Dispatcher, server: WebhookServer, host: str, port: int,
+                url: str = None, on_startup=None, on_shutdown=None):
+    """
+    Запуск до SIGTERM/SIGINT. url — публічна адреса webhook: якщо задана, реєструється
+    через setWebhook (з секретом і скиданням старих апдейтів, як skip_updates у polling);
+    без неї сервер лише слухає — для локальної перевірки.
+    """
+    app = server.make_app()
+
+    async def startup(app):
+        if url:
+            await dp.bot.set_webhook(url, secret_token=server.secret, drop_pending_updates=True)
+        if on_startup is not None:
+            await on_startup(dp)
+
+    async def shutdown(app):
+        # сокет уже закрито — дообробляємо прийняте, потім зупиняємо решту бота
+        await server.drain()
+        if on_shutdown is not None:
+            await on_shutdown(dp)
+        await dp.storage.close()
+        await dp.storage.wait_closed()
+        session = await dp.bot.get_session()
+        await session.close()
+
+    app.on_startup.append(startup)
+    app.on_shutdown.append(shutdown)
+    web.run_app(app, host=host, port=port, print=None)
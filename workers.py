@@ -0,0 +1,247 @@
+"""
+Кілька процесів-воркерів за одним приймальником апдейтів.
+
+Приймальник (polling або webhook, як звичайний bot.py) нічого не обробляє сам:
+кожен апдейт іде JSON-рядком у stdin воркера chat_id % WORKERS. Чат завжди
+обслуговує той самий воркер — порядок апдейтів чату зберігається, а кеш FSM-сесій
+кожного воркера лишається узгодженим з базою. Воркери — звичайні процеси bot.py
+(BOT_ROLE=worker) зі спільними fsm.sqlite3 і content.sqlite3; правка меню в одному
+воркері збільшує версію контенту, решта перечитують меню (див. SQLiteContentStore).
+
+WORKERS=4 CONTENT_BACKEND=sqlite python workers.py
+"""
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+
+from aiogram import Bot, Dispatcher, types
+from aiogram.bot.api import TELEGRAM_PRODUCTION, TelegramAPIServer
+from aiogram.utils import executor
+
+log = logging.getLogger(__name__)
+
+BOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+MAX_IN_FLIGHT = 100      # апдейтів в обробці на воркер; далі stdin не читається — тиск іде назад до приймальника
+LINE_LIMIT = 2 ** 20     # найдовший рядок-апдейт
+STOP_TIMEOUT = 30        # секунд на дообробку після закриття stdin
+
+
+def chat_of(update: types.Update):
+    """Ключ розподілу: чат (або користувач), до якого належить апдейт."""
+    for message in (update.message, update.edited_message, update.channel_post, update.edited_channel_post):
+        if message is not None:
+            return message.chat.id
+    query = update.callback_query
+    if query is not None:
+        return query.message.chat.id if query.message else query.from_user.id
+    for event in (update.inline_query, update.chosen_inline_result, update.my_chat_member, update.chat_member):
+        if event is not None:
+            return event.chat.id if getattr(event, "chat", None) else event.from_user.id
+    return 0
+
+
+# === Приймальник ===
+
+class WorkerPool:
+    """
+    N дочірніх процесів bot.py. Стартують по черзі: наступний — лише коли попередній
+    завантажив меню (перший воркер робить імпорт/міграцію й видає ID тем, решта їх читають).
+    Воркер, що впав, перезапускається.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._procs = [None] * size
+        self._watchers = []
+        self._stopping = False
+        self.forwarded = [0] * size
+        self.dropped = 0
+        self.restarts = 0
+
+    async def _spawn(self, index: int):
+        env = dict(os.environ, BOT_ROLE="worker", WORKER_INDEX=str(index), WORKERS=str(self.size))
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, BOT_FILE, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, env=env,
+        )
+        if (await proc.stdout.readline()).strip() != b"ready":
+            raise RuntimeError(f"Воркер {index} не стартував (код {await proc.wait()})")
+        self._procs[index] = proc
+        log.info("Воркер %d готовий (pid %d)", index, proc.pid)
+        return proc
+
+    async def start(self):
+        for index in range(self.size):
+            await self._spawn(index)
+        loop = asyncio.get_running_loop()
+        self._watchers = [loop.create_task(self._supervise(index)) for index in range(self.size)]
+
+    async def _supervise(self, index: int):
+        while True:
+            code = await self._procs[index].wait()
+            if self._stopping:
+                return
+            self.restarts += 1
+            log.error("Воркер %d завершився з кодом %s — перезапуск", index, code)
+            try:
+                await self._spawn(index)
+            except Exception:
+                log.exception("Не вдалося перезапустити воркер %d", index)
+                await asyncio.sleep(5)
+
+    async def forward(self, update: types.Update):
+        index = chat_of(update) % self.size
+        proc = self._procs[index]
+        line = json.dumps(update.to_python(), ensure_ascii=False).encode() + b"\n"
+        try:
+            # запис до першого await — апдейти одного чату лягають у канал у порядку надходження
+            proc.stdin.write(line)
+            await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError, AttributeError):
+            self.dropped += 1
+            log.warning("Воркер %d недоступний, апдейт %s втрачено", index, update.update_id)
+            return
+        self.forwarded[index] += 1
+
+    async def stop(self):
+        """Закрити stdin воркерів: кожен дообробляє прийняте й виходить сам."""
+        self._stopping = True
+        for watcher in self._watchers:
+            watcher.cancel()
+        for proc in self._procs:
+            if proc is not None and proc.returncode is None:
+                proc.stdin.close()
+        for index, proc in enumerate(self._procs):
+            if proc is None:
+                continue
+            try:
+                await asyncio.wait_for(proc.wait(), STOP_TIMEOUT + 5)
+            except asyncio.TimeoutError:
+                log.warning("Воркер %d не зупинився вчасно — kill", index)
+                proc.kill()
+                await proc.wait()
+
+    def stats(self) -> dict:
+        return {"forwarded": list(self.forwarded), "dropped": self.dropped, "restarts": self.restarts}
+
+
+class ForwardingDispatcher(Dispatcher):
+    """Диспетчер приймальника: жодних хендлерів, кожен апдейт — до свого воркера."""
+
+    def __init__(self, bot: Bot, pool: WorkerPool):
+        super().__init__(bot)
+        self.pool = pool
+
+    async def process_update(self, update: types.Update):
+        await self.pool.forward(update)
+
+
+# === Воркер ===
+
+async def _serve_stdin(dp: Dispatcher, max_in_flight: int):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=LINE_LIMIT)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    slots = asyncio.Semaphore(max_in_flight)
+    tails = {}  # чат → остання задача чату: наступний апдейт чекає на неї
+
+    async def process(update, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+        Dispatcher.set_current(dp)
+        Bot.set_current(dp.bot)
+        try:
+            await dp.updates_handler.notify(update)
+        except Exception:
+            log.exception("Помилка обробки апдейту %s", update.update_id)
+
+    def done(task, chat):
+        slots.release()
+        if tails.get(chat) is task:
+            del tails[chat]
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break  # приймальник закрив канал — зупинка
+        update = types.Update(**json.loads(line))
+        chat = chat_of(update)
+        await slots.acquire()
+        task = loop.create_task(process(update, tails.get(chat)))
+        tails[chat] = task
+        task.add_done_callback(lambda task, chat=chat: done(task, chat))
+    if tails:
+        await asyncio.wait(list(tails.values()), timeout=STOP_TIMEOUT)
+
+
+def run_worker(dp: Dispatcher, on_startup=None, on_shutdown=None, max_in_flight: int = MAX_IN_FLIGHT):
+    """Точка входу bot.py з BOT_ROLE=worker: апдейти зі stdin до EOF, «ready» у stdout після старту."""
+    # Ctrl+C і SIGTERM отримує вся група процесів — зупинку веде приймальник через EOF
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    async def main():
+        if on_startup is not None:
+            await on_startup(dp)
+        sys.stdout.write("ready\n")
+        sys.stdout.flush()
+        try:
+            await _serve_stdin(dp, max_in_flight)
+        finally:
+            if on_shutdown is not None:
+                await on_shutdown(dp)
+            await dp.storage.close()
+            await dp.storage.wait_closed()
+            session = await dp.bot.get_session()
+            await session.close()
+
+    asyncio.get_event_loop().run_until_complete(main())
+
+
+# === Запуск приймальника ===
+
+def main():
+    from dotenv import load_dotenv
+    from webhook_server import MAX_IN_FLIGHT as WEBHOOK_IN_FLIGHT, WebhookServer, run_webhook
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    size = int(os.getenv("WORKERS", "2"))
+    if os.getenv("CONTENT_BACKEND", "json") != "sqlite":
+        sys.exit("Кілька воркерів потребують CONTENT_BACKEND=sqlite: JSON-файл не можна безпечно писати з кількох процесів")
+    api_url = os.getenv("TELEGRAM_API_URL")
+    bot = Bot(token=os.getenv("BOT_TOKEN"),
+              server=TelegramAPIServer.from_base(api_url) if api_url else TELEGRAM_PRODUCTION)
+    pool = WorkerPool(size)
+    dp = ForwardingDispatcher(bot, pool)
+
+    async def on_startup(dp):
+        await pool.start()
+
+    async def on_shutdown(dp):
+        await pool.stop()
+        log.info("Воркери зупинені: %s", pool.stats())
+
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+        webhook_base = os.getenv("WEBHOOK_BASE_URL")
+        run_webhook(
+            dp,
+            WebhookServer(
+                dp, path=webhook_path, secret=os.getenv("WEBHOOK_SECRET"),
+                max_in_flight=int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", str(WEBHOOK_IN_FLIGHT))),
+            ),
+            host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", "8080")),
+            url=webhook_base.rstrip("/") + webhook_path if webhook_base else None,
+            on_startup=on_startup,
+            on_shutdown=on_shutdown,
+        )
+    else:
+        executor.start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
+
+
+if __name__ == "__main__":
+    main()